@@ -115,6 +115,111 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # ===============================================
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 
+# ===============================================
+# 🧠 EMBEDDINGS
+# ===============================================
+# Proveedor: 'openai' (API) o 'local' (hashing de n-gramas, sin red). Al
+# cambiarlo hay que volver a ejecutar book_embeddings
+EMBEDDING_PROVIDER = os.getenv('EMBEDDING_PROVIDER', 'openai')
+LOCAL_EMBEDDING_DIM = 512
+
+# Matriz float32 empaquetada (mmap) que comparten las vistas de recomendación
+EMBEDDING_STORE_DIR = BASE_DIR / 'data' / 'embeddings'
+
+# Copia compacta para buscar candidatos: None, 'float16' o 'int8'. Los mejores
+# k * EMBEDDING_RERANK_FACTOR se vuelven a puntuar con la matriz float32
+EMBEDDING_QUANTIZATION = None
+EMBEDDING_RERANK_FACTOR = 4
+
+# Índice IVF (build_ann_index): listas revisadas por consulta (más = más recall,
+# más latencia) y tamaño de catálogo a partir del cual se usa en vez de la
+# búsqueda exacta
+ANN_NPROBE = 8
+ANN_MIN_CATALOG_SIZE = 20000
+
+# Caché de embeddings de prompts: entradas en memoria (por proceso) y en la
+# tabla, que se recorta cada PROMPT_CACHE_EVICT_EVERY inserciones
+PROMPT_CACHE_MEMORY_SIZE = 512
+PROMPT_CACHE_DB_SIZE = 20000
+PROMPT_CACHE_EVICT_EVERY = 100
+
+# Búsqueda híbrida: segundos que se espera al lado vectorial antes de
+# responder solo con los resultados léxicos
+HYBRID_VECTOR_TIMEOUT = 0.5
+
+# ===============================================
+# ⚡ CACHÉ
+# ===============================================
+# Las invalidaciones van por versiones de espacio de nombres (books/cache.py):
+# subir una versión solo se ve en los procesos que comparten la caché.
+# - 'locmem' (por omisión): cada proceso tiene la suya. Solo sirve con un
+#   único proceso (runserver, un worker); con varios, los demás siguen
+#   sirviendo datos viejos hasta que expiran.
+# - 'file': compartida entre procesos del mismo servidor (en CACHE_DIR), pero
+#   su incr no es atómico: dos cambios simultáneos pueden subir la versión
+#   una sola vez.
+# - 'redis': compartida entre servidores, con incr atómico (REDIS_URL;
+#   necesita el paquete redis). La recomendada con varios workers.
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem')
+CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'acentos',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('CACHE_DIR', str(BASE_DIR / 'data' / 'cache')),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('REDIS_URL', 'redis://127.0.0.1:6379/1'),
+    },
+}
+CACHES = {'default': {**CACHE_BACKENDS[CACHE_BACKEND], 'TIMEOUT': 60 * 60}}
+
+# Las claves llevan la versión del catálogo (books/cache.py), así que los
+# tiempos de expiración solo acotan lo que ocupa una entrada ya invalidada
+FACET_CACHE_TIMEOUT = 60 * 60
+
+# Resultados del catálogo (ids ordenados por filtros + orden): duración y
+# máximo de ids guardados por entrada
+RESULT_CACHE_TIMEOUT = 5 * 60
+RESULT_CACHE_MAX_IDS = 5000
+
+# Autocompletado: si otro proceso cambió el catálogo, segundos mínimos entre
+# reconstrucciones del índice en memoria
+TYPEAHEAD_REBUILD_INTERVAL = 60
+
+# Búsqueda: ids que se traen del índice de texto completo de una vez; con más
+# coincidencias el total se cuenta y las páginas siguientes se piden al índice
+SEARCH_MAX_IDS = 1000
+
+# Corrección de búsquedas: se ofrece cuando hay menos resultados que esto; el
+# vocabulario se rehace como mucho cada SPELLING_REBUILD_INTERVAL segundos
+SPELLING_MIN_RESULTS = 3
+SPELLING_REBUILD_INTERVAL = 10 * 60
+
+# Libros al azar de la portada: segundos mínimos entre recargas de los ids
+# del catálogo cuando este cambia
+SAMPLE_POOL_REFRESH_INTERVAL = 5 * 60
+
+# Top 100: calificaciones que necesita un libro para que su promedio pese
+# tanto como el del catálogo (ver books/ranking.py)
+TOP_RANKING_MIN_VOTES = 50
+
+# Secciones de la portada (segundos). Se invalidan con la versión del
+# catálogo, de las calificaciones o de las reseñas; la expiración acota los
+# cambios que no suben ninguna, como el nombre de un usuario en las últimas
+# reseñas
+HOME_SECTION_TIMEOUTS = {
+    'top_rated': 60 * 60,
+    'new_books': 60 * 60,
+    'latest_reviews': 10 * 60,
+    'counts': 60 * 60,
+}
+
 # ===============================================
 # ⚙️ SESIONES Y ARCHIVOS ESTÁTICOS
 # ===============================================
@@ -1,6 +1,18 @@
 from django.contrib import admin
-from .models import Book
+from .models import Author, Book, PromptEmbedding
 
 @admin.register(Book)
 class BookAdmin(admin.ModelAdmin):
 	list_display = ("title", "authors", "average_rating")
+
+
+@admin.register(Author)
+class AuthorAdmin(admin.ModelAdmin):
+	list_display = ("name",)
+	search_fields = ("name_norm",)
+
+
+@admin.register(PromptEmbedding)
+class PromptEmbeddingAdmin(admin.ModelAdmin):
+	list_display = ("prompt", "model", "hits", "last_used_at")
+	exclude = ("vector",)
@@ -0,0 +1,207 @@
+"""
+Índice aproximado de vecinos más cercanos (IVF) sobre los embeddings.
+
+Los vectores del ``EmbeddingStore`` se agrupan con k-means esférico en
+``n_lists`` listas invertidas. Una consulta solo puntúa los libros de las
+``nprobe`` listas cuyos centroides son más parecidos al vector pedido, así que
+el costo deja de crecer linealmente con el catálogo. ``nprobe`` es la perilla
+de recall/latencia: más listas = más recall y más tiempo.
+
+El índice guarda solo centroides e ids; los vectores se leen del almacén.
+"""
+import math
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+from .embedding_store import get_store_dir, temp_path
+from .similarity import normalize, search_store, top_k
+
+INDEX_FILE = 'ivf.npz'
+
+
+def _assign(vectors, centroids, block_size=8192):
+    """Lista (centroide más parecido) de cada vector, calculado por bloques."""
+    out = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), block_size):
+        block = np.asarray(vectors[start:start + block_size])
+        out[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return out
+
+
+def train_centroids(vectors, n_lists, iterations=10, sample_size=20000, seed=0):
+    """K-means esférico sobre una muestra de los vectores (ya normalizados)."""
+    rng = np.random.default_rng(seed)
+    n = len(vectors)
+    sample_rows = np.sort(rng.choice(n, size=min(n, sample_size), replace=False))
+    sample = np.asarray(vectors[sample_rows])
+    centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)].copy()
+
+    for _ in range(iterations):
+        assign = _assign(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, sample)
+        counts = np.bincount(assign, minlength=n_lists)
+        # Las listas vacías se vuelven a sembrar con puntos al azar
+        empty = counts == 0
+        if empty.any():
+            sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()), replace=False)]
+        centroids = normalize(sums)
+    return centroids
+
+
+class IVFIndex:
+    """Listas invertidas en formato CSR: ``ids[offsets[l]:offsets[l+1]]``."""
+
+    def __init__(self, centroids, ids, assignments):
+        self.centroids = centroids
+        self._set_lists(ids, assignments)
+
+    def _set_lists(self, ids, assignments):
+        order = np.argsort(assignments, kind='stable')
+        self.ids = np.asarray(ids, dtype=np.int64)[order]
+        self.assignments = np.asarray(assignments, dtype=np.int32)[order]
+        counts = np.bincount(self.assignments, minlength=len(self.centroids))
+        self.offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+    @property
+    def n_lists(self):
+        return len(self.centroids)
+
+    def __len__(self):
+        return len(self.ids)
+
+    # ---------------------------------------------------
+    # Construcción, inserción y persistencia
+    # ---------------------------------------------------
+    @classmethod
+    def build(cls, store, n_lists=None, iterations=10, sample_size=20000):
+        """Entrena los centroides y reparte todo el almacén en listas."""
+        if n_lists is None:
+            n_lists = max(1, int(4 * math.sqrt(len(store))))
+        n_lists = min(n_lists, len(store))
+        centroids = train_centroids(store.matrix, n_lists, iterations, sample_size)
+        return cls(centroids, store.ids.copy(), _assign(store.matrix, centroids))
+
+    def add(self, book_ids, vectors):
+        """
+        Inserta libros nuevos asignándolos a su centroide más cercano. Los
+        centroides no se reentrenan; conviene reconstruir el índice cuando el
+        catálogo crezca mucho.
+        """
+        book_ids = np.asarray(book_ids, dtype=np.int64)
+        new = ~np.isin(book_ids, self.ids)
+        if not new.any():
+            return 0
+        assign = _assign(normalize(np.asarray(vectors)[new]), self.centroids)
+        self._set_lists(np.concatenate([self.ids, book_ids[new]]),
+                        np.concatenate([self.assignments, assign]))
+        return int(new.sum())
+
+    def save(self, directory=None):
+        directory = Path(directory or get_store_dir())
+        directory.mkdir(parents=True, exist_ok=True)
+        tmp = temp_path(directory, 'ivf.', '.npz')
+        np.savez(tmp, centroids=self.centroids, ids=self.ids, assignments=self.assignments)
+        os.replace(tmp, directory / INDEX_FILE)
+
+    @classmethod
+    def load(cls, directory=None):
+        directory = Path(directory or get_store_dir())
+        with np.load(directory / INDEX_FILE) as data:
+            return cls(data['centroids'], data['ids'], data['assignments'])
+
+    # ---------------------------------------------------
+    # Búsqueda
+    # ---------------------------------------------------
+    def candidates(self, query, nprobe):
+        """Ids de los libros en las ``nprobe`` listas más cercanas a la consulta."""
+        nprobe = max(1, min(nprobe, self.n_lists))
+        lists, _ = top_k(query, self.centroids, nprobe)
+        chunks = [self.ids[self.offsets[l]:self.offsets[l + 1]] for l in lists]
+        return np.concatenate(chunks) if chunks else np.empty(0, dtype=np.int64)
+
+    def search(self, store, query, k, nprobe, exclude_ids=None):
+        """
+        Devuelve una lista de (book_id, similitud) como ``search_store``. Si
+        las listas visitadas no alcanzan para ``k`` libros (listas pequeñas o
+        casi todo excluido), se visitan el doble hasta completar o recorrer
+        todas.
+        """
+        nprobe = max(1, min(nprobe, self.n_lists))
+        exclude = list(exclude_ids) if exclude_ids else None
+        while True:
+            candidate_ids = self.candidates(query, nprobe)
+            if exclude:
+                candidate_ids = candidate_ids[~np.isin(candidate_ids, exclude)]
+            found_ids, rows = store.rows_for(candidate_ids)
+            if len(rows) >= k or nprobe >= self.n_lists:
+                break
+            nprobe = min(nprobe * 2, self.n_lists)
+        if not len(rows):
+            return []
+        # Leer filas en orden ascendente favorece el acceso secuencial al mmap
+        order = np.argsort(rows)
+        found_ids, rows = found_ids[order], rows[order]
+        idx, scores = top_k(query, np.asarray(store.matrix[rows]), k)
+        return list(zip(found_ids[idx].tolist(), scores.tolist()))
+
+
+# -------------------------------------------------------
+# Instancia compartida por proceso
+# -------------------------------------------------------
+_index = None
+_index_mtime = None
+_lock = threading.Lock()
+
+
+def get_ann_index():
+    """Índice compartido, o ``None`` si todavía no se ha construido."""
+    global _index, _index_mtime
+    path = get_store_dir() / INDEX_FILE
+    try:
+        mtime = path.stat().st_mtime
+    except FileNotFoundError:
+        return None
+    if _index is None or mtime != _index_mtime:
+        with _lock:
+            _index = IVFIndex.load()
+            _index_mtime = mtime
+    return _index
+
+
+def update_ann_index(store):
+    """
+    Inserta en el índice persistido los libros del almacén que aún no estén.
+    Si el índice no existe no hace nada. Devuelve cuántos libros se agregaron.
+    """
+    index = get_ann_index()
+    if index is None or not len(store) or index.centroids.shape[1] != store.dim:
+        return 0
+    new_ids = store.ids[~np.isin(store.ids, index.ids)]
+    if not len(new_ids):
+        return 0
+    added = index.add(new_ids, store.vectors_for(new_ids))
+    index.save()
+    return added
+
+
+def ann_search(store, query, k, exclude_ids=None, nprobe=None):
+    """
+    Búsqueda sobre el catálogo completo. Usa el índice IVF cuando el catálogo
+    supera ``ANN_MIN_CATALOG_SIZE``; con catálogos pequeños (o sin índice) hace
+    la búsqueda exacta, que a esa escala es igual de rápida y siempre exacta.
+    """
+    min_size = getattr(settings, 'ANN_MIN_CATALOG_SIZE', 20000)
+    index = get_ann_index() if len(store) >= min_size else None
+    # Un índice de otro proveedor (otra dimensión) no sirve hasta reconstruirlo
+    if index is not None and index.centroids.shape[1] != store.dim:
+        index = None
+    if index is None:
+        return search_store(store, query, k, exclude_ids=exclude_ids)
+    if nprobe is None:
+        nprobe = getattr(settings, 'ANN_NPROBE', 8)
+    return index.search(store, query, k, nprobe, exclude_ids=exclude_ids)
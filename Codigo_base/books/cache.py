@@ -0,0 +1,145 @@
+"""
+Claves de caché versionadas por espacio de nombres.
+
+Cada espacio tiene un número de versión guardado en la caché:
+
+- ``'catalog'``: libros (``Book``).
+- ``'ratings'``: calificaciones de los libros; guardar solo
+  ``average_rating``/``ratings_count`` (lo que hacen las reseñas) sube esta
+  versión y no la del catálogo.
+- ``'reviews'``: reseñas (``Review``).
+- ``'orders'``: pedidos y sus ítems (``Order``, ``OrderItem``).
+- ``'favorites'``: favoritos (``Favorite``).
+
+Las señales de esos modelos (``signals.py``) suben la versión al guardar o
+borrar. Las claves llevan la versión vigente de los espacios de los que
+dependen, así que invalidar es un solo ``bump_version``: las entradas viejas
+dejan de leerse y expiran solas. La versión vive en la caché misma, así que
+solo invalida en los procesos que comparten el backend de ``CACHES``: con
+memoria local, únicamente en el proceso que hizo el cambio (ver
+``CACHE_BACKEND`` en settings).
+
+Para cachear un cálculo: ``cached(espacios, partes_de_la_clave, función,
+timeout)`` o el decorador ``@cached_function(espacios, timeout)``. Para
+estructuras en memoria de cada proceso (índices, listas de ids):
+``ProcessLocal``.
+"""
+import functools
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+
+NAMESPACES = ('catalog', 'ratings', 'reviews', 'orders', 'favorites')
+
+
+def _version_key(namespace):
+    return f'version:{namespace}'
+
+
+def get_version(namespace):
+    version = cache.get(_version_key(namespace))
+    if version is None:
+        # Arrancar desde el reloj (no desde 1) evita reutilizar una versión
+        # vieja si la caché descartó la clave de versión
+        cache.add(_version_key(namespace), int(time.time() * 1000), timeout=None)
+        version = cache.get(_version_key(namespace))
+    return version
+
+
+def bump_version(namespace):
+    try:
+        return cache.incr(_version_key(namespace))
+    except ValueError:
+        get_version(namespace)
+        return cache.incr(_version_key(namespace))
+
+
+def _namespaces(namespaces):
+    return (namespaces,) if isinstance(namespaces, str) else tuple(namespaces)
+
+
+def versioned_key(namespaces, *parts):
+    """
+    Clave corta (apta para memcached) para ``parts`` en la versión vigente de
+    ``namespaces`` (un espacio o varios).
+    """
+    namespaces = _namespaces(namespaces)
+    versions = '.'.join(str(get_version(namespace)) for namespace in namespaces)
+    digest = hashlib.md5(repr(parts).encode('utf-8')).hexdigest()
+    return f"{'+'.join(namespaces)}:{versions}:{digest}"
+
+
+def cached(namespaces, key_parts, compute, timeout=DEFAULT_TIMEOUT):
+    """
+    Valor de ``compute()`` guardado bajo una clave versionada de
+    ``namespaces``: se recalcula al subir alguna de sus versiones o al
+    expirar ``timeout`` (por omisión, el de ``CACHES``).
+    """
+    return cache.get_or_set(versioned_key(namespaces, *key_parts), compute, timeout)
+
+
+def cached_function(namespaces, timeout=DEFAULT_TIMEOUT):
+    """
+    Decorador: cachea el resultado de la función según sus argumentos (que
+    deben tener un ``repr`` estable: números, textos, tuplas...).
+    ``funcion.uncached`` es la versión sin caché.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key_parts = (func.__module__, func.__qualname__, args, sorted(kwargs.items()))
+            return cached(namespaces, key_parts, lambda: func(*args, **kwargs), timeout)
+        wrapper.uncached = func
+        return wrapper
+    return decorator
+
+
+class ProcessLocal:
+    """
+    Valor que cada proceso construye una vez (``build()``) a partir de la base
+    de datos y guarda en memoria. Se construye en el primer ``get()``; si la
+    versión de ``namespace`` cambió desde entonces (otro proceso modificó los
+    datos) se reconstruye, pero como mucho cada ``interval_setting`` segundos.
+    """
+
+    def __init__(self, build, interval_setting, default_interval, namespace='catalog'):
+        self.build = build
+        self.interval_setting = interval_setting
+        self.default_interval = default_interval
+        self.namespace = namespace
+        self.value = None
+        self.version = None
+        self.built_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        value = self.value
+        interval = getattr(settings, self.interval_setting, self.default_interval)
+        stale = value is not None and self.version != get_version(self.namespace) \
+            and time.monotonic() - self.built_at > interval
+        if value is None or stale:
+            with self._lock:
+                if self.value is value:
+                    # La versión se lee antes de construir: un cambio durante la
+                    # construcción deja el valor marcado como desactualizado
+                    version = get_version(self.namespace)
+                    self.value = self.build()
+                    self.version, self.built_at = version, time.monotonic()
+        return self.value
+
+    def loaded(self):
+        """El valor si ya se construyó en este proceso (sin construirlo)."""
+        return self.value
+
+    def mark_current(self, value):
+        """
+        Tras aplicar a ``value`` un cambio local (que subió la versión en uno):
+        si estaba al día antes del cambio, lo sigue estando.
+        """
+        version = get_version(self.namespace)
+        if value is self.value and self.version == version - 1:
+            self.version = version
@@ -0,0 +1,112 @@
+"""
+Proveedores de embeddings intercambiables.
+
+El proveedor activo se elige con ``EMBEDDING_PROVIDER`` en settings ('openai',
+'local' o la ruta de una clase propia). Su ``model`` identifica el espacio
+vectorial: se guarda en ``Book.embedding_model`` junto a cada vector y forma
+parte de la clave de la caché de prompts, así nunca se comparan vectores de
+proveedores distintos.
+"""
+import math
+import os
+import zlib
+
+import numpy as np
+from django.conf import settings
+from django.utils.module_loading import import_string
+from openai import OpenAI
+
+from .text import tokens
+
+
+class EmbeddingProvider:
+    """Interfaz: ``embed(textos)`` devuelve una lista de vectores (listas de float)."""
+    name = ''
+    model = ''
+
+    def embed(self, texts):
+        raise NotImplementedError
+
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    name = 'openai'
+    model = 'text-embedding-3-small'
+
+    def __init__(self):
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            api_key = getattr(settings, 'OPENAI_API_KEY', None) or os.getenv("OPENAI_API_KEY")
+            if not api_key:
+                raise ValueError("❌ No se encontró la API key de OpenAI en las variables de entorno.")
+            self._client = OpenAI(api_key=api_key)
+        return self._client
+
+    def embed(self, texts):
+        response = self.client.embeddings.create(model=self.model, input=list(texts))
+        return [item.embedding for item in response.data]
+
+
+class LocalHashingEmbeddingProvider(EmbeddingProvider):
+    """
+    Embeddings locales sin red: palabras y n-gramas de caracteres (3 y 4) del
+    texto normalizado, proyectados con hashing firmado a un vector de
+    dimensión fija, con peso sublineal (1 + log tf) y norma 1. No necesita
+    entrenamiento y un prompt se vectoriza en microsegundos.
+    """
+    name = 'local'
+
+    def __init__(self, dim=None):
+        self.dim = dim or getattr(settings, 'LOCAL_EMBEDDING_DIM', 512)
+        self.model = f'local-hash-{self.dim}'
+
+    def features(self, text):
+        words = tokens(text)
+        for word in words:
+            yield f'w:{word}'
+            padded = f' {word} '
+            for n in (3, 4):
+                for i in range(len(padded) - n + 1):
+                    yield padded[i:i + n]
+
+    def embed_one(self, text):
+        counts = {}
+        for feature in self.features(text):
+            # crc32 es determinista entre procesos (a diferencia de hash())
+            h = zlib.crc32(feature.encode('utf-8'))
+            index = h % self.dim
+            sign = 1.0 if (h >> 31) & 1 else -1.0
+            counts[index, sign] = counts.get((index, sign), 0) + 1
+
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for (index, sign), tf in counts.items():
+            vector[index] += sign * (1.0 + math.log(tf))
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector /= norm
+        return vector.tolist()
+
+    def embed(self, texts):
+        return [self.embed_one(text) for text in texts]
+
+
+PROVIDERS = {
+    'openai': OpenAIEmbeddingProvider,
+    'local': LocalHashingEmbeddingProvider,
+}
+
+_provider = None
+_provider_setting = None
+
+
+def get_embedding_provider():
+    """Instancia (compartida) del proveedor configurado en settings."""
+    global _provider, _provider_setting
+    setting = getattr(settings, 'EMBEDDING_PROVIDER', 'openai')
+    if _provider is None or setting != _provider_setting:
+        provider_class = PROVIDERS.get(setting) or import_string(setting)
+        _provider = provider_class()
+        _provider_setting = setting
+    return _provider
@@ -0,0 +1,294 @@
+"""
+Almacén binario de embeddings.
+
+Empaqueta ``Book.embeddings`` (JSON) en una matriz float32 contigua, una fila
+por libro y ya normalizada a norma 1, más un arreglo ordenado con los ids. Solo
+entran los vectores del proveedor de embeddings activo. Ambos se guardan como ``.npy``
+y se abren con ``mmap`` para que todos los workers compartan las mismas
+páginas en memoria y ninguna vista tenga que decodificar JSON.
+
+El almacén solo se construye con ``build_embedding_store`` o
+``book_embeddings``. Cada construcción escribe archivos nuevos (con nombre
+único) y los publica de una vez reemplazando ``meta.json``, que indica qué
+matriz, ids y versión cuantizada están vigentes; un candado de archivo evita dos construcciones
+a la vez. Las vistas nunca construyen: sin almacén reciben uno vacío y usan
+sus alternativas.
+"""
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+from .embedding_providers import get_embedding_provider
+from .models import Book
+from .quantization import QuantizedMatrix
+
+# Nombres fijos de versiones anteriores (se siguen leyendo si meta.json no
+# indica otros archivos)
+MATRIX_FILE = 'matrix.npy'
+IDS_FILE = 'ids.npy'
+META_FILE = 'meta.json'
+LOCK_FILE = '.build.lock'
+
+
+def get_quantization():
+    """Tipo de cuantización configurado ('float16', 'int8') o ``None``."""
+    return getattr(settings, 'EMBEDDING_QUANTIZATION', None)
+
+
+def get_store_dir():
+    """Carpeta donde se guardan los archivos del almacén."""
+    default = Path(settings.BASE_DIR) / 'data' / 'embeddings'
+    return Path(getattr(settings, 'EMBEDDING_STORE_DIR', default))
+
+
+def temp_path(directory, prefix, suffix='.npy'):
+    """Ruta de un archivo temporal nuevo (nombre único) dentro de ``directory``."""
+    fd, path = tempfile.mkstemp(dir=directory, prefix=prefix, suffix=suffix)
+    os.close(fd)
+    return Path(path)
+
+
+@contextmanager
+def build_lock(directory):
+    """Candado exclusivo entre procesos para construir en ``directory``."""
+    with open(Path(directory) / LOCK_FILE, 'a+b') as f:
+        try:
+            import fcntl
+        except ImportError:  # Windows
+            import msvcrt
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            return
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _read_meta(directory):
+    try:
+        with open(Path(directory) / META_FILE, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _publish(directory, meta):
+    """Reemplaza meta.json de forma atómica: publica matriz, ids y cuantizada juntos."""
+    tmp = temp_path(directory, 'meta.', '.json')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(tmp, Path(directory) / META_FILE)
+
+
+def _remove_stale_files(directory, meta):
+    """Borra archivos de construcciones anteriores (y temporales huérfanos)."""
+    current = {meta['matrix'], meta['ids']}
+    if meta.get('quantized'):
+        current.update(name for name in (meta['quantized']['codes'], meta['quantized']['scales']) if name)
+    for path in Path(directory).glob('*.npy'):
+        if path.name.startswith(('matrix.', 'ids.', 'codes.', 'scales.')) and path.name not in current:
+            try:
+                path.unlink(missing_ok=True)
+            except OSError:
+                # Windows no deja borrar un archivo que otro proceso tiene con mmap
+                pass
+
+
+class EmbeddingStore:
+    """Matriz de embeddings (n_libros x dim) con su índice de ids ordenado."""
+
+    def __init__(self, ids, matrix, version='', quantized=None, model=''):
+        self.ids = ids
+        self.matrix = matrix
+        # Modelo de embeddings de los vectores (Book.embedding_model)
+        self.model = model
+        # Identifica la construcción en disco; cambia cada vez que se reconstruye
+        self.version = version
+        # Copia compacta (float16/int8) para buscar candidatos, si está activada
+        self.quantized = quantized
+
+    @property
+    def dim(self):
+        return self.matrix.shape[1] if self.matrix.ndim == 2 else 0
+
+    def __len__(self):
+        return len(self.ids)
+
+    # ---------------------------------------------------
+    # Construcción y carga
+    # ---------------------------------------------------
+    @classmethod
+    def empty(cls, model=''):
+        return cls(np.empty(0, dtype=np.int64), np.empty((0, 0), dtype=np.float32), model=model)
+
+    @classmethod
+    def build(cls, directory=None, chunk_size=2000):
+        """
+        Lee los embeddings de la base de datos por bloques y escribe la matriz
+        empaquetada en disco. Devuelve el almacén ya abierto con mmap.
+        """
+        directory = Path(directory or get_store_dir())
+        directory.mkdir(parents=True, exist_ok=True)
+        with build_lock(directory):
+            meta = cls._write(directory, get_embedding_provider().model, chunk_size)
+            _publish(directory, meta)
+            _remove_stale_files(directory, meta)
+        return cls.load(directory)
+
+    @classmethod
+    def _write(cls, directory, model, chunk_size):
+        """Escribe matriz e ids en archivos nuevos y devuelve su meta (sin publicar)."""
+        qs = (Book.objects.exclude(embeddings__isnull=True)
+              .filter(embedding_model=model)
+              .order_by('id')
+              .values_list('id', 'embeddings'))
+        total = qs.count()
+        first = qs.first()
+        matrix_path = temp_path(directory, 'matrix.')
+        ids_path = temp_path(directory, 'ids.')
+        meta = {'model': model, 'matrix': matrix_path.name, 'ids': ids_path.name}
+        if not total or not first or not first[1]:
+            np.save(ids_path, np.empty(0, dtype=np.int64))
+            np.save(matrix_path, np.empty((0, 0), dtype=np.float32))
+            return meta
+
+        dim = len(first[1])
+        matrix = np.lib.format.open_memmap(matrix_path, mode='w+', dtype=np.float32, shape=(total, dim))
+        ids = np.empty(total, dtype=np.int64)
+
+        n = 0
+        for book_id, emb in qs.iterator(chunk_size=chunk_size):
+            # Se descartan vectores vacíos o con otra dimensión
+            if not emb or len(emb) != dim:
+                continue
+            vec = np.asarray(emb, dtype=np.float32)
+            norm = np.linalg.norm(vec)
+            matrix[n] = vec / norm if norm else vec
+            ids[n] = book_id
+            n += 1
+        matrix.flush()
+        del matrix
+
+        if n < total:
+            full = np.load(matrix_path, mmap_mode='r')
+            trimmed = temp_path(directory, 'matrix.')
+            np.save(trimmed, np.ascontiguousarray(full[:n]))
+            del full
+            os.replace(trimmed, matrix_path)
+        np.save(ids_path, ids[:n])
+
+        # La versión cuantizada se publica junto con su matriz: nunca se mezcla
+        # con la de otra construcción
+        kind = get_quantization()
+        if kind:
+            quantized = QuantizedMatrix.from_matrix(np.load(matrix_path, mmap_mode='r'), kind)
+            meta['quantized'] = quantized.save(directory)
+        return meta
+
+    @classmethod
+    def load(cls, directory=None):
+        """Abre el almacén publicado, o ``None`` si no hay ninguno."""
+        directory = Path(directory or get_store_dir())
+        meta = _read_meta(directory)
+        if meta is None:
+            return None
+        matrix_file = meta.get('matrix', MATRIX_FILE)
+        try:
+            ids = np.load(directory / meta.get('ids', IDS_FILE))
+            matrix = np.load(directory / matrix_file, mmap_mode='r')
+        except FileNotFoundError:
+            return None
+        version = str((directory / matrix_file).stat().st_mtime_ns)
+        kind = get_quantization()
+        files = meta.get('quantized')
+        quantized = None
+        if kind and files and files['kind'] == kind:
+            quantized = QuantizedMatrix.load(directory, files)
+        return cls(ids, matrix, version, quantized, meta.get('model', ''))
+
+    # ---------------------------------------------------
+    # Consultas
+    # ---------------------------------------------------
+    def rows_for(self, book_ids):
+        """Devuelve (ids encontrados, índices de fila) para los ids pedidos."""
+        if not len(self.ids):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        wanted = np.asarray(list(book_ids), dtype=np.int64)
+        pos = np.searchsorted(self.ids, wanted)
+        pos = np.clip(pos, 0, len(self.ids) - 1)
+        found = self.ids[pos] == wanted
+        return wanted[found], pos[found]
+
+    def mask_for(self, book_ids):
+        """Máscara booleana (una posición por fila) con los libros pedidos."""
+        mask = np.zeros(len(self.ids), dtype=bool)
+        _, rows = self.rows_for(book_ids)
+        mask[rows] = True
+        return mask
+
+    def vector(self, book_id):
+        """Embedding de un libro, o ``None`` si no está en el almacén."""
+        _, rows = self.rows_for([book_id])
+        if not len(rows):
+            return None
+        return np.asarray(self.matrix[rows[0]])
+
+    def vectors_for(self, book_ids):
+        """Matriz con los embeddings de los libros pedidos que existan."""
+        _, rows = self.rows_for(book_ids)
+        return np.asarray(self.matrix[rows])
+
+
+# -------------------------------------------------------
+# Instancia compartida por proceso
+# -------------------------------------------------------
+_store = None
+_store_mtime = None
+_lock = threading.Lock()
+
+
+def get_embedding_store():
+    """
+    Devuelve el almacén compartido. Si se publica uno nuevo en disco (por
+    ejemplo tras ``build_embedding_store``) se vuelve a abrir. Si no existe,
+    o es de otro proveedor de embeddings, devuelve un almacén vacío: nunca
+    se construye dentro de una petición.
+    """
+    global _store, _store_mtime
+    try:
+        mtime = (get_store_dir() / META_FILE).stat().st_mtime_ns
+    except FileNotFoundError:
+        mtime = None
+
+    model = get_embedding_provider().model
+    if _store is not None and mtime == _store_mtime and _store.model == model:
+        return _store
+
+    with _lock:
+        store = EmbeddingStore.load() if mtime is not None else None
+        if store is None or store.model != model:
+            store = EmbeddingStore.empty(model)
+        _store, _store_mtime = store, mtime
+    return _store
+
+
+def rebuild_embedding_store():
+    """Reconstruye el almacén en disco y lo publica para este proceso."""
+    global _store, _store_mtime
+    with _lock:
+        _store = EmbeddingStore.build()
+        _store_mtime = (get_store_dir() / META_FILE).stat().st_mtime_ns
+    return _store
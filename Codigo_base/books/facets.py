@@ -0,0 +1,97 @@
+"""
+Conteos por faceta (género, autor, precio, calificación, año) para el
+catálogo.
+
+Cada faceta se cuenta con todos los filtros activos menos el suyo, así
+el panel muestra cuántos libros daría cada opción alternativa. Los rangos de
+precio, calificación y año salen de una sola agregación con ``Count(filter=...)``
+por cada conjunto distinto de filtros (uno solo si esas facetas no están
+activas). El resultado se cachea por la firma de los filtros y la versión
+del catálogo. Las calificaciones cambian con cada reseña sin subir esa
+versión, así que lo que depende de ellas (la faceta de calificación, o todo
+si ese filtro está activo) va además con la versión ``'ratings'``.
+"""
+from django.conf import settings
+from django.db.models import Count, Q
+
+from .cache import cached
+from .filters import PRICE_RANGES, RATING_THRESHOLDS, YEAR_RANGES, apply_filters, signature
+from .models import Author, Book
+
+BUCKET_FACETS = {
+    'price_range': [
+        (value, label, Q(precio__gte=low, precio__lte=high)) for value, label, low, high in PRICE_RANGES
+    ],
+    'rating': [
+        (value, label, Q(average_rating__gte=threshold)) for value, label, threshold in RATING_THRESHOLDS
+    ],
+    'year': [
+        (value, label, Q(publication_year__gte=low, publication_year__lte=high))
+        for value, label, low, high in YEAR_RANGES
+    ],
+}
+
+
+def _genre_counts(filters):
+    rows = (apply_filters(Book.objects.all(), filters, exclude='genre')
+            .exclude(genre='')
+            .values('genre')
+            .annotate(count=Count('id'))
+            .order_by('genre'))
+    return [{'value': row['genre'], 'count': row['count']} for row in rows]
+
+
+def _author_counts(filters):
+    books = apply_filters(Book.objects.all(), filters, exclude='author')
+    rows = (Author.objects.filter(books__in=books)
+            .annotate(count=Count('books'))
+            .order_by('name')
+            .values_list('name', 'count'))
+    return [{'value': name, 'count': count} for name, count in rows]
+
+
+def _bucket_counts(filters, facets=BUCKET_FACETS):
+    # Facetas cuyo conjunto de filtros (sin ellas mismas) coincide comparten consulta
+    groups = {}
+    for facet in facets:
+        groups.setdefault(signature(filters, exclude=facet), []).append(facet)
+
+    counts = {}
+    for facets in groups.values():
+        qs = apply_filters(Book.objects.all(), filters, exclude=facets[0])
+        aggregates = {
+            f'{facet}__{i}': Count('id', filter=condition)
+            for facet in facets
+            for i, (_, _, condition) in enumerate(BUCKET_FACETS[facet])
+        }
+        totals = qs.aggregate(**aggregates)
+        for facet in facets:
+            counts[facet] = [
+                {'value': value, 'label': label, 'count': totals[f'{facet}__{i}']}
+                for i, (value, label, _) in enumerate(BUCKET_FACETS[facet])
+            ]
+    return counts
+
+
+def facet_counts(filters):
+    """
+    Devuelve ``{'genre': [...], 'author': [...], 'price_range': [...],
+    'rating': [...], 'year': [...]}``; cada opción es un dict con ``value``,
+    ``count`` y (en los rangos) ``label``.
+    """
+    timeout = getattr(settings, 'FACET_CACHE_TIMEOUT', 3600)
+    key = signature(filters)
+
+    def compute(facets):
+        result = {'genre': _genre_counts(filters), 'author': _author_counts(filters)}
+        result.update(_bucket_counts(filters, facets))
+        return result
+
+    if filters.get('rating'):
+        return cached(('catalog', 'ratings'), ('facets', key), lambda: compute(BUCKET_FACETS), timeout)
+
+    others = [facet for facet in BUCKET_FACETS if facet != 'rating']
+    result = dict(cached('catalog', ('facets', key), lambda: compute(others), timeout))
+    result['rating'] = cached(('catalog', 'ratings'), ('facets', 'rating', key),
+                              lambda: _bucket_counts(filters, ['rating'])['rating'], timeout)
+    return result
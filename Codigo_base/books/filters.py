@@ -0,0 +1,102 @@
+"""
+Filtros del catálogo: búsqueda, género, autor, precio, calificación y año.
+
+``parse_filters`` lleva los parámetros GET a una forma canónica (valores
+normalizados y ordenados), de modo que dos URLs equivalentes dan la misma
+``signature`` y comparten entradas de caché.
+"""
+import json
+
+from .models import Book
+from . import search_index
+from .text import fold
+
+# (valor del parámetro, etiqueta, mínimo, máximo) — rangos inclusivos
+PRICE_RANGES = [
+    ('0-30000', 'Menos de $30,000', 0, 30000),
+    ('30000-50000', '$30,000 - $50,000', 30000, 50000),
+    ('50000-80000', '$50,000 - $80,000', 50000, 80000),
+    ('80000-999999', 'Más de $80,000', 80000, 999999),
+]
+RATING_THRESHOLDS = [
+    ('5', '5 estrellas', 5),
+    ('4', '4+ estrellas', 4),
+    ('3', '3+ estrellas', 3),
+]
+YEAR_RANGES = [
+    ('2020-2025', '2020 - 2025', 2020, 2025),
+    ('2010-2019', '2010 - 2019', 2010, 2019),
+    ('2000-2009', '2000 - 2009', 2000, 2009),
+    ('1990-1999', '1990 - 1999', 1990, 1999),
+    ('1900-1989', 'Antes de 1990', 1900, 1989),
+]
+
+
+def _parse_range(value):
+    try:
+        low, high = map(int, value.split('-'))
+    except (AttributeError, ValueError):
+        return None
+    return [low, high]
+
+
+def _parse_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_filters(params):
+    """Filtros activos a partir de un ``QueryDict`` (request.GET)."""
+    return {
+        'q': params.get('q', '').strip(),
+        'genre': sorted({fold(g) for g in params.getlist('genre') if g}),
+        'author': sorted({fold(a) for a in params.getlist('author') if a}),
+        'price_range': _parse_range(params.get('price_range', '').strip()),
+        'rating': _parse_float(params.get('rating', '').strip()),
+        'year': _parse_range(params.get('year', '').strip()),
+    }
+
+
+def signature(filters, exclude=None):
+    """Texto canónico de los filtros (sin ``exclude``), para claves de caché."""
+    return json.dumps({k: v for k, v in filters.items() if k != exclude and v}, sort_keys=True)
+
+
+def books_by_authors(names_norm):
+    """Subconsulta con los ids de libros de cualquiera de esos autores."""
+    return Book.autores.through.objects.filter(author__name_norm__in=names_norm).values('book_id')
+
+
+def apply_filters(qs, filters, exclude=None):
+    """Aplica los filtros activos a ``qs``, menos el indicado en ``exclude``."""
+    active = {k: v for k, v in filters.items() if k != exclude and v}
+
+    # 🔍 Búsqueda por texto
+    if 'q' in active:
+        qs = search_index.filter_queryset(qs, active['q'])
+
+    # 📚 Género
+    if 'genre' in active:
+        qs = qs.filter(genre_norm__in=active['genre'])
+
+    # 👤 Autor
+    if 'author' in active:
+        qs = qs.filter(id__in=books_by_authors(active['author']))
+
+    # 💰 Precio
+    if 'price_range' in active:
+        min_price, max_price = active['price_range']
+        qs = qs.filter(precio__gte=min_price, precio__lte=max_price)
+
+    # ⭐ Calificación
+    if 'rating' in active:
+        qs = qs.filter(average_rating__gte=active['rating'])
+
+    # 📅 Año
+    if 'year' in active:
+        start_year, end_year = active['year']
+        qs = qs.filter(publication_year__gte=start_year, publication_year__lte=end_year)
+
+    return qs
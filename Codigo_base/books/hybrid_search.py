@@ -0,0 +1,93 @@
+"""
+Búsqueda híbrida: léxica + vectorial, fusionadas con Reciprocal Rank Fusion.
+
+Cada recuperador devuelve una lista ordenada de ids; RRF suma ``1 / (k + rango)``
+por lista, así no hace falta calibrar puntajes de naturaleza distinta. La parte
+vectorial (embedding del prompt cacheado + índice ANN) corre en un hilo con
+tiempo límite: si tarda más de ``HYBRID_VECTOR_TIMEOUT`` segundos la respuesta
+sale solo con los resultados léxicos. Si los ``VECTOR_WORKERS`` hilos ya están
+ocupados (un proveedor lento), tampoco se encola nada: solo léxica.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from django.conf import settings
+from django.db import connections
+
+from .ann_index import ann_search
+from .embedding_providers import get_embedding_provider
+from .embedding_store import get_embedding_store
+from .models import Book
+from .prompt_cache import prompt_embedding_cache
+from . import search_index
+
+RRF_K = 60
+# Los vecinos semánticos lejanos solo meten ruido: se fusionan los primeros
+VECTOR_LIMIT = 20
+
+VECTOR_WORKERS = 4
+
+_executor = ThreadPoolExecutor(max_workers=VECTOR_WORKERS, thread_name_prefix='hybrid-search')
+# Búsquedas vectoriales en vuelo (corriendo o esperando hilo)
+_in_flight = threading.BoundedSemaphore(VECTOR_WORKERS)
+
+
+def lexical_ids(query, limit):
+    """Ids que coinciden por texto, del más al menos relevante."""
+    ids = search_index.search_ids(query, limit)
+    if ids is not None:
+        return ids
+    # Sin índice de texto completo: columnas normalizadas, los más valorados primero
+    return list(
+        search_index.filter_queryset(Book.objects.all(), query)
+        .order_by('-ratings_count', 'id').values_list('id', flat=True)[:limit]
+    )
+
+
+def vector_ids(query, limit):
+    """Ids más parecidos semánticamente al texto buscado."""
+    try:
+        provider = get_embedding_provider()
+        vector = prompt_embedding_cache.get(query, provider.model, lambda text: provider.embed([text])[0])
+        return [book_id for book_id, _ in ann_search(get_embedding_store(), vector, limit)]
+    finally:
+        # Este hilo abre su propia conexión; se cierra para no dejarla colgada
+        connections.close_all()
+
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """Combina varias listas ordenadas de ids en una sola."""
+    scores = {}
+    for ranking in rankings:
+        for rank, book_id in enumerate(ranking, start=1):
+            scores[book_id] = scores.get(book_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=lambda book_id: -scores[book_id])
+
+
+def hybrid_search(query, limit=100, timeout=None):
+    """
+    Devuelve (ids ordenados, usó_vectores). Si el lado vectorial falla o se
+    pasa del tiempo límite, devuelve solo el orden léxico.
+    """
+    if timeout is None:
+        timeout = getattr(settings, 'HYBRID_VECTOR_TIMEOUT', 0.5)
+
+    if not _in_flight.acquire(blocking=False):
+        return lexical_ids(query, limit), False
+    try:
+        future = _executor.submit(vector_ids, query, min(limit, VECTOR_LIMIT))
+    except Exception:
+        _in_flight.release()
+        raise
+    # El cupo se libera al terminar (o al cancelarse), no al dejar de esperar
+    future.add_done_callback(lambda _: _in_flight.release())
+
+    lexical = lexical_ids(query, limit)
+    try:
+        semantic = future.result(timeout=timeout)
+    except TimeoutError:
+        future.cancel()
+        return lexical, False
+    except Exception:
+        return lexical, False
+    return reciprocal_rank_fusion([lexical, semantic])[:limit], True
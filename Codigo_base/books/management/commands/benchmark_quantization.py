@@ -0,0 +1,60 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from books.embedding_store import get_embedding_store
+from books.quantization import KINDS, QuantizedMatrix
+from books.similarity import top_k, top_k_quantized
+
+
+class Command(BaseCommand):
+    help = ("Compara la búsqueda float32 con las versiones float16/int8: memoria ahorrada, "
+            "recall@k frente a los resultados exactos y latencia por consulta.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queries', type=int, default=200, help="Libros usados como consultas.")
+        parser.add_argument('--k', type=int, default=10, help="Tamaño del top-k a comparar.")
+        parser.add_argument('--rerank', type=int, nargs='+', default=[1, 4],
+                            help="Factores de re-ranking a probar (1 = sin re-ranking).")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        store = get_embedding_store()
+        k = options['k']
+        if len(store) <= k:
+            self.stdout.write(self.style.WARNING("El catálogo con embeddings es demasiado pequeño para el benchmark."))
+            return
+
+        matrix = np.asarray(store.matrix)
+        rng = np.random.default_rng(options['seed'])
+        query_rows = rng.choice(len(store), size=min(options['queries'], len(store)), replace=False)
+
+        # Resultados exactos (float32) como referencia
+        start = time.perf_counter()
+        truth = []
+        for row in query_rows:
+            mask = np.zeros(len(store), dtype=bool)
+            mask[row] = True
+            truth.append(set(top_k(matrix[row], matrix, k, exclude_mask=mask)[0].tolist()))
+        base_ms = (time.perf_counter() - start) * 1000 / len(query_rows)
+
+        self.stdout.write(f"{len(store)} libros, dimensión {store.dim}, {len(query_rows)} consultas, k={k}\n")
+        self.stdout.write(f"{'tipo':<10}{'memoria':>12}{'ahorro':>9}{'rerank':>8}{'recall@k':>10}{'ms/consulta':>13}")
+        self.stdout.write(f"{'float32':<10}{matrix.nbytes / 2**20:>10.1f}MB{'-':>9}{'-':>8}{1.0:>10.3f}{base_ms:>13.2f}")
+
+        for kind in KINDS:
+            quantized = QuantizedMatrix.from_matrix(matrix, kind)
+            saved = 1 - quantized.nbytes / matrix.nbytes
+            for factor in options['rerank']:
+                hits = 0
+                start = time.perf_counter()
+                for row, expected in zip(query_rows, truth):
+                    mask = np.zeros(len(store), dtype=bool)
+                    mask[row] = True
+                    found, _ = top_k_quantized(matrix[row], quantized, matrix, k,
+                                               exclude_mask=mask, rerank_factor=factor)
+                    hits += len(expected & set(found.tolist()))
+                ms = (time.perf_counter() - start) * 1000 / len(query_rows)
+                recall = hits / (k * len(query_rows))
+                self.stdout.write(f"{kind:<10}{quantized.nbytes / 2**20:>10.1f}MB{saved:>8.0%}{factor:>8}{recall:>10.3f}{ms:>13.2f}")
@@ -1,71 +1,212 @@
 from django.core.management.base import BaseCommand
 from books.models import Book
-from django.conf import settings
-from openai import OpenAI
-import math
+from books.embedding_store import get_store_dir, rebuild_embedding_store, temp_path
+from books.embedding_providers import get_embedding_provider
+from books.ann_index import update_ann_index
+from django.db.models import Q
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from openai import RateLimitError, APIConnectionError, APITimeoutError, InternalServerError
+import json
+import os
+import random
 import time
-from tqdm import tqdm  # 💪 barra de progreso opcional (instalar con `pip install tqdm`)
+
+MAX_INPUTS_PER_REQUEST = 2048
+RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)
+
+
+def book_text(book):
+    """Texto que se envía a la API para representar un libro."""
+    text_parts = [
+        book.title or "",
+        f"Autor: {book.authors}" if book.authors else "",
+        f"Género: {book.genre}" if book.genre else "",
+        f"Editorial: {book.publisher}" if book.publisher else "",
+    ]
+    return ". ".join(part for part in text_parts if part).strip()
+
+
+def estimate_tokens(text):
+    """Aproximación barata (~4 caracteres por token) para armar los lotes."""
+    return len(text) // 4 + 1
+
 
 class Command(BaseCommand):
-    help = "⚡ Genera embeddings por lotes (más rápido y eficiente) y los guarda en formato JSON."
+    help = ("⚡ Genera embeddings (con el proveedor de EMBEDDING_PROVIDER) usando un pipeline "
+            "concurrente: lotes por número de tokens, "
+            "varias peticiones en paralelo, bulk_update por lote, reintentos con backoff "
+            "exponencial y checkpoint para continuar una ejecución interrumpida.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4,
+                            help="Peticiones simultáneas a la API.")
+        parser.add_argument('--max-tokens', type=int, default=8000,
+                            help="Tokens (estimados) máximos por lote.")
+        parser.add_argument('--max-retries', type=int, default=6,
+                            help="Reintentos por lote ante límites de velocidad o errores de red.")
+        parser.add_argument('--checkpoint', default=None,
+                            help="Archivo de checkpoint (por defecto junto al almacén de embeddings).")
+        parser.add_argument('--reset', action='store_true',
+                            help="Ignora el checkpoint y revisa todos los libros pendientes.")
 
     def handle(self, *args, **options):
-        client = OpenAI(api_key=settings.OPENAI_API_KEY)
+        self.provider = get_embedding_provider()
+        self.max_retries = options['max_retries']
+        self.checkpoint_path = options['checkpoint'] or str(get_store_dir() / 'embeddings_checkpoint.json')
 
-        # 🔍 Buscar libros que aún no tengan embeddings
-        books = list(Book.objects.filter(embeddings__isnull=True))
-        total = len(books)
-        batch_size = 100  # 🔥 Ajustá este valor según tu velocidad o límite de tokens
-        num_batches = math.ceil(total / batch_size)
+        checkpoint = {} if options['reset'] else self.load_checkpoint()
+        # Un checkpoint de otro proveedor no sirve: todo su avance es de otro modelo
+        last_id = checkpoint.get('last_id', 0) if checkpoint.get('model') == self.provider.model else 0
 
+        # 🔍 Libros sin embeddings del proveedor activo, posteriores al checkpoint
+        pending = Book.objects.filter(self.pending_filter(), id__gt=last_id)
+        total = pending.count()
         if total == 0:
+            self.delete_checkpoint()
             self.stdout.write(self.style.SUCCESS("No hay libros pendientes para generar embeddings."))
             return
 
-        self.stdout.write(f"Libros pendientes: {total}")
-        self.stdout.write(f"Procesando en {num_batches} lotes de hasta {batch_size} libros cada uno\n")
-
-        # 🌀 Iterar sobre lotes con barra de progreso
-        for i in range(num_batches):
-            batch = books[i * batch_size:(i + 1) * batch_size]
-            texts, ids = [], []
-
-            for book in batch:
-                text_parts = [
-                    book.title or "",
-                    f"Autor: {book.authors}" if book.authors else "",
-                    f"Género: {book.genre}" if book.genre else "",
-                    f"Editorial: {book.publisher}" if book.publisher else "",
-                ]
-                text = ". ".join(part for part in text_parts if part).strip()
-                if text:
-                    texts.append(text)
-                    ids.append(book.id)
-
-            if not texts:
-                continue
+        if last_id:
+            self.stdout.write(f"Reanudando desde el libro #{last_id}")
+        self.stdout.write(f"Libros pendientes: {total} (modelo {self.provider.model}, "
+                          f"concurrencia {options['concurrency']})\n")
+
+        batches = self.make_batches(self.pending_books(last_id), options['max_tokens'])
+
+        self.done = 0
+        # Lotes enviados en orden; el checkpoint solo avanza hasta el último
+        # lote de un prefijo completo, así un fallo o un corte nunca se salta libros
+        in_order = []
+        finished = {}
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            running = {}
+            for number, batch in enumerate(batches, start=1):
+                in_order.append(number)
+                running[pool.submit(self.embed_batch, batch)] = (number, batch)
+                # Mantener acotado el trabajo en vuelo
+                while len(running) >= options['concurrency'] * 2:
+                    self.collect(running, finished, total)
+                last_id = self.advance_checkpoint(in_order, finished, last_id)
+            while running:
+                self.collect(running, finished, total)
+                last_id = self.advance_checkpoint(in_order, finished, last_id)
+
+        if in_order:
+            self.stderr.write("Algunos lotes fallaron; vuelve a ejecutar el comando para reintentarlos.")
+        else:
+            # Todo se completó: la próxima ejecución revisa el catálogo entero
+            # (libros cuyo embedding se borró aunque su id quede atrás)
+            self.delete_checkpoint()
 
+        # 📦 Reempaquetar la matriz binaria que usan las vistas
+        store = rebuild_embedding_store()
+        self.stdout.write(f"Almacén de embeddings actualizado ({len(store)} libros)")
+        added = update_ann_index(store)
+        if added:
+            self.stdout.write(f"Índice ANN: {added} libros nuevos insertados")
+
+        self.stdout.write(self.style.SUCCESS(f"Embeddings generados: {self.done} de {total} libros pendientes"))
+
+    # ---------------------------------------------------
+    # Lotes y llamadas a la API
+    # ---------------------------------------------------
+    def pending_filter(self):
+        return Q(embeddings__isnull=True) | ~Q(embedding_model=self.provider.model)
+
+    def pending_books(self, last_id, page_size=2000):
+        """
+        Recorre los libros pendientes por páginas de id. No se deja un cursor
+        abierto porque la misma tabla se actualiza mientras se itera.
+        """
+        while True:
+            page = list(Book.objects.filter(self.pending_filter(), id__gt=last_id)
+                        .order_by('id')
+                        .only('id', 'title', 'authors', 'genre', 'publisher')[:page_size])
+            if not page:
+                return
+            yield from page
+            last_id = page[-1].id
+
+    def make_batches(self, books, max_tokens):
+        """Agrupa los libros en lotes que no pasen de ``max_tokens`` estimados."""
+        batch, tokens = [], 0
+        for book in books:
+            text = book_text(book)
+            size = estimate_tokens(text) if text else 0
+            if batch and (tokens + size > max_tokens or len(batch) >= MAX_INPUTS_PER_REQUEST):
+                yield batch
+                batch, tokens = [], 0
+            batch.append((book, text))
+            tokens += size
+        if batch:
+            yield batch
+
+    def embed_batch(self, batch):
+        """Pide los embeddings de un lote, con backoff exponencial ante errores temporales."""
+        texts = [text for _, text in batch if text]
+        if not texts:
+            return []
+        for attempt in range(self.max_retries + 1):
             try:
-                # 🚀 Llamada masiva a la API de embeddings
-                response = client.embeddings.create(
-                    model="text-embedding-3-small",
-                    input=texts
-                )
-
-                # 💾 Guardar embeddings como JSON
-                for j, emb_data in enumerate(response.data):
-                    book_id = ids[j]
-                    embedding = emb_data.embedding
-                    book = next(b for b in batch if b.id == book_id)
-                    book.embeddings = embedding
-                    book.save(update_fields=["embeddings"])
-
-                self.stdout.write(f"Lote {i+1}/{num_batches} completado ({len(batch)} libros)")
-                time.sleep(1.5)  # Pausa ligera para evitar limite de velocidad
+                return self.provider.embed(texts)
+            except RETRYABLE_ERRORS:
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(min(60, 2 ** attempt) + random.uniform(0, 1))
 
+    def collect(self, running, finished, total):
+        """Espera a que termine al menos un lote y guarda sus resultados."""
+        completed, _ = wait(running, return_when=FIRST_COMPLETED)
+        for future in completed:
+            number, batch = running.pop(future)
+            try:
+                embeddings = future.result()
             except Exception as e:
-                self.stderr.write(f"Error en lote {i+1}: {str(e)}")
-                time.sleep(5)
+                self.stderr.write(f"Error en lote {number}: {e}")
+                finished[number] = None
                 continue
 
-        self.stdout.write(self.style.SUCCESS("Todos los embeddings fueron generados y guardados exitosamente"))
+            # 💾 Una sola escritura por lote
+            to_save = [book for book, text in batch if text]
+            for book, embedding in zip(to_save, embeddings):
+                book.embeddings = embedding
+                book.embedding_model = self.provider.model
+            Book.objects.bulk_update(to_save, ['embeddings', 'embedding_model'], batch_size=500)
+
+            finished[number] = batch[-1][0].id
+            self.done += len(to_save)
+            self.stdout.write(f"Lote {number} completado ({self.done}/{total} libros)")
+
+    # ---------------------------------------------------
+    # Checkpoint
+    # ---------------------------------------------------
+    def advance_checkpoint(self, in_order, finished, last_id):
+        """
+        Avanza ``last_id`` por los lotes terminados en orden. Un lote fallido
+        (``None``) se queda al frente de la cola y congela el checkpoint.
+        """
+        while in_order and finished.get(in_order[0]):
+            last_id = finished.pop(in_order.pop(0))
+        self.save_checkpoint({'model': self.provider.model, 'last_id': last_id})
+        return last_id
+
+    def load_checkpoint(self):
+        try:
+            with open(self.checkpoint_path, encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def save_checkpoint(self, data):
+        directory = os.path.dirname(os.path.abspath(self.checkpoint_path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = temp_path(directory, 'checkpoint.', '.json')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def delete_checkpoint(self):
+        try:
+            os.remove(self.checkpoint_path)
+        except FileNotFoundError:
+            pass
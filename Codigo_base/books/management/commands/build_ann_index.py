@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from books.ann_index import IVFIndex, update_ann_index
+from books.embedding_store import get_embedding_store, get_store_dir
+
+
+class Command(BaseCommand):
+    help = "Construye (o actualiza) el índice IVF de vecinos aproximados sobre los embeddings de los libros."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lists', type=int, default=None,
+                            help="Número de listas invertidas (por defecto 4 * sqrt(n_libros)).")
+        parser.add_argument('--iterations', type=int, default=10,
+                            help="Iteraciones de k-means para entrenar los centroides.")
+        parser.add_argument('--sample', type=int, default=20000,
+                            help="Cantidad de vectores usados para entrenar los centroides.")
+        parser.add_argument('--update', action='store_true',
+                            help="Solo inserta los libros nuevos en el índice existente, sin reentrenar.")
+
+    def handle(self, *args, **options):
+        store = get_embedding_store()
+        if not len(store):
+            self.stdout.write(self.style.WARNING("No hay embeddings en el almacén. Ejecuta primero build_embedding_store."))
+            return
+
+        if options['update']:
+            added = update_ann_index(store)
+            self.stdout.write(self.style.SUCCESS(f"Índice actualizado: {added} libros nuevos insertados."))
+            return
+
+        self.stdout.write(f"Entrenando índice IVF sobre {len(store)} libros...")
+        index = IVFIndex.build(store, n_lists=options['lists'],
+                               iterations=options['iterations'],
+                               sample_size=options['sample'])
+        index.save()
+        self.stdout.write(self.style.SUCCESS(
+            f"Índice guardado en {get_store_dir()}: {index.n_lists} listas, {len(index)} libros."
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from books.embedding_store import get_store_dir, rebuild_embedding_store
+
+
+class Command(BaseCommand):
+    help = "Empaqueta los embeddings de los libros en una matriz float32 binaria (mmap) para las vistas."
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Construyendo almacén de embeddings en {get_store_dir()}...")
+        store = rebuild_embedding_store()
+        size_mb = store.matrix.nbytes / (1024 * 1024)
+        self.stdout.write(self.style.SUCCESS(
+            f"Almacén listo: {len(store)} libros, dimensión {store.dim}, {size_mb:.1f} MB"
+        ))
@@ -0,0 +1,124 @@
+import hashlib
+import os
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from books.embedding_store import get_embedding_store, get_store_dir, temp_path
+from books.models import SimilarBook
+from books.similarity import top_k_batch
+
+FINGERPRINTS_FILE = 'similar_fingerprints.npz'
+
+
+def fingerprints(store):
+    """Huella de 64 bits de cada vector del almacén, para detectar cambios."""
+    out = np.empty(len(store), dtype=np.uint64)
+    for row in range(len(store)):
+        digest = hashlib.blake2b(np.asarray(store.matrix[row]).tobytes(), digest_size=8).digest()
+        out[row] = int.from_bytes(digest, 'little')
+    return out
+
+
+class Command(BaseCommand):
+    help = ("Precalcula los N libros más parecidos de cada libro (multiplicación de matrices por bloques "
+            "sobre todo el catálogo) y los guarda en la tabla SimilarBook.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=12, help="Vecinos a guardar por libro.")
+        parser.add_argument('--block-size', type=int, default=512,
+                            help="Libros consultados por bloque de multiplicación.")
+        parser.add_argument('--changed', action='store_true',
+                            help="Solo refresca los libros cuyo embedding cambió desde la última ejecución "
+                                 "y los vecinos que ellos afectan.")
+
+    def handle(self, *args, **options):
+        store = get_embedding_store()
+        top, block_size = options['top'], options['block_size']
+        if len(store) < 2:
+            self.stdout.write(self.style.WARNING("No hay suficientes embeddings para calcular vecinos."))
+            return
+
+        current = fingerprints(store)
+        fp_path = get_store_dir() / FINGERPRINTS_FILE
+
+        if options['changed'] and fp_path.exists():
+            with np.load(fp_path) as data:
+                old = dict(zip(data['ids'].tolist(), data['fingerprints'].tolist()))
+            changed_rows = np.array([row for row, (book_id, fp) in enumerate(zip(store.ids.tolist(), current.tolist()))
+                                     if old.get(book_id) != fp], dtype=np.int64)
+            removed_ids = set(old) - set(store.ids.tolist())
+            rows = self.affected_rows(store, changed_rows, removed_ids, top, block_size)
+            self.stdout.write(f"{len(changed_rows)} libros cambiaron; se recalculan {len(rows)} listas de vecinos.")
+        else:
+            rows = np.arange(len(store))
+            self.stdout.write(f"Calculando vecinos de {len(rows)} libros...")
+
+        written = 0
+        for start in range(0, len(rows), block_size):
+            written += self.write_neighbours(store, rows[start:start + block_size], top)
+            self.stdout.write(f"  {min(start + block_size, len(rows))}/{len(rows)} libros")
+
+        get_store_dir().mkdir(parents=True, exist_ok=True)
+        tmp = temp_path(get_store_dir(), 'similar_fingerprints.', '.npz')
+        np.savez(tmp, ids=store.ids, fingerprints=current)
+        os.replace(tmp, fp_path)
+        self.stdout.write(self.style.SUCCESS(f"Listo: {written} relaciones de similitud guardadas."))
+
+    def write_neighbours(self, store, rows, top):
+        """Calcula y reemplaza en la base de datos los vecinos de las filas dadas."""
+        queries = np.asarray(store.matrix[rows])
+        # Se pide un vecino de más porque cada libro se encuentra a sí mismo
+        idx, scores = top_k_batch(queries, store.matrix, top + 1)
+
+        book_ids = store.ids[rows].tolist()
+        entries = []
+        for own_row, book_id, neigh_rows, neigh_scores in zip(rows.tolist(), book_ids, idx, scores):
+            rank = 0
+            for row, score in zip(neigh_rows.tolist(), neigh_scores.tolist()):
+                if row == own_row:
+                    continue
+                if row < 0 or rank == top:
+                    break
+                rank += 1
+                entries.append(SimilarBook(book_id=book_id, similar_id=int(store.ids[row]),
+                                           score=score, rank=rank))
+        with transaction.atomic():
+            SimilarBook.objects.filter(book_id__in=book_ids).delete()
+            SimilarBook.objects.bulk_create(entries, batch_size=1000)
+        return len(entries)
+
+    def affected_rows(self, store, changed_rows, removed_ids, top, block_size):
+        """
+        Filas cuya lista de vecinos hay que recalcular: los libros que
+        cambiaron, los que tenían como vecino a un libro cambiado o eliminado
+        y los que ahora tendrían un libro cambiado entre sus N mejores.
+        """
+        changed_ids = set(store.ids[changed_rows].tolist()) | removed_ids
+
+        # Vecino N-ésimo actual de cada libro (umbral para entrar en su lista)
+        threshold, counts = {}, {}
+        stale = set()
+        for book_id, similar_id, score in SimilarBook.objects.values_list('book_id', 'similar_id', 'score'):
+            if similar_id in changed_ids:
+                stale.add(book_id)
+            threshold[book_id] = min(score, threshold.get(book_id, score))
+            counts[book_id] = counts.get(book_id, 0) + 1
+
+        # Las listas incompletas (o inexistentes) también se recalculan
+        expected = min(top, len(store) - 1)
+        stale |= {book_id for book_id in store.ids.tolist() if counts.get(book_id, 0) < expected}
+
+        affected = np.zeros(len(store), dtype=bool)
+        affected[changed_rows] = True
+        affected |= store.mask_for(stale)
+
+        changed_matrix = np.asarray(store.matrix[changed_rows])
+        if len(changed_matrix):
+            limits = np.array([threshold.get(book_id, -np.inf) for book_id in store.ids.tolist()], dtype=np.float32)
+            for start in range(0, len(store), block_size * 8):
+                block = np.asarray(store.matrix[start:start + block_size * 8])
+                best = (block @ changed_matrix.T).max(axis=1)
+                affected[start:start + len(block)] |= best > limits[start:start + len(block)]
+        return np.flatnonzero(affected)
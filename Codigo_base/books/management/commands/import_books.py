@@ -1,8 +1,14 @@
 from django.core.management.base import BaseCommand
-from books.models import Book
+from books import ranking, search_index, stats
+from books.cache import NAMESPACES, bump_version
+from books.models import Author, Book, UserTaste
+from books.signals import bulk_loading
 import csv
 from pathlib import Path
 
+BATCH_SIZE = 1000
+
+
 class Command(BaseCommand):
     help = 'Importa libros desde un archivo books.csv al modelo Book.'
 
@@ -13,14 +19,35 @@ class Command(BaseCommand):
             self.stderr.write(self.style.ERROR(f'Archivo no encontrado: {csv_path}'))
             return
 
-        # Eliminar todos los libros existentes para evitar duplicados
-        Book.objects.all().delete()
-        self.stdout.write(self.style.WARNING('Se eliminaron todos los libros existentes.'))
+        # 📦 Carga masiva: las señales por libro (autores, índice de texto,
+        # ranking, estadísticas, cachés) se reemplazan por reconstrucciones al final
+        with bulk_loading():
+            # Eliminar todos los libros existentes para evitar duplicados
+            Book.objects.only('id').delete()
+            Author.objects.filter(books__isnull=True).delete()
+            self.stdout.write(self.style.WARNING('Se eliminaron todos los libros existentes.'))
+            count, errors = self.import_rows(csv_path)
+            self.stdout.write(self.style.SUCCESS(f'Proceso completado: {count} libros importados, {errors} errores.'))
+
+        self.stdout.write('Reconstruyendo datos derivados...')
+        Author.link_books(Book.objects.all())
+        search_index.rebuild(Book.objects.all())
+        ranking.refresh()
+        stats.refresh()
+        # Favoritos y reseñas se borraron con los libros: los gustos se recalculan al leerse
+        UserTaste.objects.all().delete()
+        for namespace in NAMESPACES:
+            bump_version(namespace)
+        self.stdout.write(self.style.SUCCESS(
+            'Autores, índice de búsqueda, ranking y estadísticas listos. '
+            'Ejecuta book_embeddings para generar los embeddings.'))
 
+    def import_rows(self, csv_path):
+        count = 0
+        errors = 0
+        batch = []
         with open(csv_path, encoding='utf-8') as csvfile:
             reader = csv.DictReader(csvfile)
-            count = 0
-            errors = 0
             for row in reader:
                 try:
                     book = Book(
@@ -36,13 +63,32 @@ class Command(BaseCommand):
                         genre=row.get('Genre', 'Sin género'),
                         description=row.get('Description', ''),
                     )
-                    book.save()
-                    count += 1
-                    if count % 1000 == 0:
-                        self.stdout.write(self.style.SUCCESS(f'Importados {count} libros...'))
+                    # bulk_create no pasa por Book.save()
+                    book.fill_derived_fields()
+                    batch.append(book)
                 except Exception as e:
                     errors += 1
                     if errors <= 10:  # Solo mostrar los primeros 10 errores
-                        self.stderr.write(self.style.ERROR(f'Error en fila {count+1}: {e}'))
+                        self.stderr.write(self.style.ERROR(f'Error en fila {count + len(batch) + 1}: {e}'))
+                if len(batch) >= BATCH_SIZE:
+                    saved = self.save_batch(batch)
+                    count, errors = count + saved, errors + len(batch) - saved
+                    batch = []
+                    self.stdout.write(self.style.SUCCESS(f'Importados {count} libros...'))
+            saved = self.save_batch(batch)
+        return count + saved, errors + len(batch) - saved
 
-            self.stdout.write(self.style.SUCCESS(f'Proceso completado: {count} libros importados, {errors} errores.'))
+    def save_batch(self, batch):
+        try:
+            Book.objects.bulk_create(batch)
+            return len(batch)
+        except Exception:
+            # Un libro inválido no debe tirar el lote completo: se guardan de a uno
+            saved = 0
+            for book in batch:
+                try:
+                    Book.objects.bulk_create([book])
+                    saved += 1
+                except Exception as e:
+                    self.stderr.write(self.style.ERROR(f'Error guardando "{book.title}": {e}'))
+            return saved
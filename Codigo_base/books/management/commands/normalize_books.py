@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from books.models import Book
+
+
+class Command(BaseCommand):
+    help = ("Rellena las columnas derivadas (title_norm, authors_norm, publisher_norm, "
+            "genre_norm, publication_year) de los libros cargados sin pasar por Book.save(), "
+            "p. ej. con bulk_create.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        fields = list(Book.NORMALIZED_FIELDS) + ['publication_date']
+        norm_fields = list(Book.NORMALIZED_FIELDS.values()) + ['publication_year']
+        updated = 0
+        last_id = 0
+        while True:
+            page = list(Book.objects.filter(id__gt=last_id).order_by('id')
+                        .only('id', *fields, *norm_fields)[:options['batch_size']])
+            if not page:
+                break
+            changed = []
+            for book in page:
+                before = [getattr(book, field) for field in norm_fields]
+                book.fill_derived_fields()
+                if before != [getattr(book, field) for field in norm_fields]:
+                    changed.append(book)
+            Book.objects.bulk_update(changed, norm_fields)
+            updated += len(changed)
+            last_id = page[-1].id
+
+        self.stdout.write(self.style.SUCCESS(f"Columnas derivadas actualizadas en {updated} libros"))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from books import search_index
+from books.models import Book
+
+
+class Command(BaseCommand):
+    help = "Reconstruye el índice de texto completo (FTS5 en SQLite, tsvector + GIN en PostgreSQL)."
+
+    def handle(self, *args, **options):
+        if not search_index.is_available():
+            self.stdout.write(self.style.WARNING(
+                "Esta base de datos no tiene índice de texto completo; aplica las migraciones "
+                "o usa SQLite con FTS5 / PostgreSQL."))
+            return
+        total = search_index.rebuild(Book.objects.all())
+        self.stdout.write(self.style.SUCCESS(f"Índice de búsqueda reconstruido: {total} libros"))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from books import stats
+
+
+class Command(BaseCommand):
+    help = "Recalcula los conteos de libros por año y por género de la página de estadísticas."
+
+    def handle(self, *args, **options):
+        snapshot = stats.refresh()
+        self.stdout.write(self.style.SUCCESS(
+            f"Estadísticas recalculadas: {len(snapshot.by_year)} años, {len(snapshot.by_genre)} géneros"))
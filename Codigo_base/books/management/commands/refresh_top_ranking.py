@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from books import ranking
+from books.models import TopRankingParameters
+
+
+class Command(BaseCommand):
+    help = "Recalcula el ranking de mejores libros por calificación ponderada (TopRanking)."
+
+    def handle(self, *args, **options):
+        total = ranking.refresh()
+        parameters = TopRankingParameters.objects.first()
+        if parameters is None:
+            self.stdout.write(self.style.WARNING("No hay libros calificados: el ranking quedó vacío."))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Ranking recalculado: {total} libros (promedio del catálogo {parameters.mean_rating:.3f}, "
+            f"m = {parameters.min_votes})"))
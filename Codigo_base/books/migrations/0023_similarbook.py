@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0022_order_paid_at_order_payment_method_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarBook',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_entries', to='books.book')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='books.book')),
+            ],
+            options={
+                'ordering': ['book', 'rank'],
+                'unique_together': {('book', 'rank')},
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:01
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0023_similarbook'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PromptEmbedding',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('prompt', models.TextField()),
+                ('model', models.CharField(max_length=100)),
+                ('vector', models.BinaryField()),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0024_promptembedding'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserTaste',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('vector_sum', models.BinaryField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('store_version', models.CharField(max_length=40)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='taste', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
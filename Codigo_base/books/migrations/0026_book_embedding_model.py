@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:06
+
+from django.db import migrations, models
+
+
+def mark_openai_embeddings(apps, schema_editor):
+    # Todos los vectores existentes se generaron con OpenAI
+    Book = apps.get_model('books', 'Book')
+    Book.objects.filter(embeddings__isnull=False).update(embedding_model='text-embedding-3-small')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0025_usertaste'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='embedding_model',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.RunPython(mark_openai_embeddings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,78 @@
+import unicodedata
+
+from django.db import migrations
+
+# Copia congelada del esquema de books/search_index.py al crear esta
+# migración: cambios posteriores en ese módulo no deben alterarla
+FTS_TABLE = 'books_book_fts'
+PG_TABLE = 'books_book_search'
+FIELDS = ('title', 'authors', 'genre', 'publisher')
+
+
+def fold(text):
+    if not text:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            try:
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+                    f"USING fts5({', '.join(FIELDS)}, tokenize='unicode61')"
+                )
+            except Exception:
+                # SQLite sin FTS5: se busca en las columnas normalizadas
+                return
+            insert = f"INSERT INTO {FTS_TABLE} (rowid, {', '.join(FIELDS)}) VALUES (%s, %s, %s, %s, %s)"
+        elif connection.vendor == 'postgresql':
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {PG_TABLE} ("
+                f"book_id integer PRIMARY KEY REFERENCES books_book(id) ON DELETE CASCADE "
+                f"DEFERRABLE INITIALLY DEFERRED, document tsvector NOT NULL)"
+            )
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {PG_TABLE}_document_gin "
+                f"ON {PG_TABLE} USING GIN (document)"
+            )
+            document = ' || '.join(
+                f"setweight(to_tsvector('simple', %s), '{weight}')" for weight in ('A', 'B', 'C', 'D')
+            )
+            insert = f"INSERT INTO {PG_TABLE} (book_id, document) VALUES (%s, {document})"
+        else:
+            return
+
+        Book = apps.get_model('books', 'Book')
+        books = Book.objects.using(connection.alias).order_by('id').values_list('id', *FIELDS)
+        rows = []
+        for book_id, *values in books.iterator(chunk_size=2000):
+            rows.append([book_id] + [fold(value or '') for value in values])
+            if len(rows) >= 2000:
+                cursor.executemany(insert, rows)
+                rows = []
+        if rows:
+            cursor.executemany(insert, rows)
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+        elif connection.vendor == 'postgresql':
+            cursor.execute(f"DROP TABLE IF EXISTS {PG_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0026_book_embedding_model'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
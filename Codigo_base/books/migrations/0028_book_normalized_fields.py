@@ -0,0 +1,66 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:11
+
+import unicodedata
+
+from django.db import migrations, models
+
+NORMALIZED_FIELDS = {
+    'title': 'title_norm',
+    'authors': 'authors_norm',
+    'publisher': 'publisher_norm',
+    'genre': 'genre_norm',
+}
+
+
+def fold(text):
+    # Copia congelada de books.text.fold al crear esta migración
+    if not text:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def fill_normalized_fields(apps, schema_editor):
+    Book = apps.get_model('books', 'Book')
+    last_id = 0
+    while True:
+        page = list(Book.objects.filter(id__gt=last_id).order_by('id')
+                    .only('id', *NORMALIZED_FIELDS)[:2000])
+        if not page:
+            return
+        for book in page:
+            for field, norm_field in NORMALIZED_FIELDS.items():
+                setattr(book, norm_field, fold(getattr(book, field) or ''))
+        Book.objects.bulk_update(page, list(NORMALIZED_FIELDS.values()))
+        last_id = page[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0027_book_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='authors_norm',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=1024),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='genre_norm',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='publisher_norm',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='title_norm',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=1024),
+        ),
+        migrations.RunPython(fill_normalized_fields, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:12
+
+import unicodedata
+
+from django.db import migrations, models
+
+
+# Copias congeladas de books.text.fold y split_authors al crear esta migración
+def fold(text):
+    if not text:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def split_authors(authors):
+    names = {}
+    for name in (authors or '').split('/'):
+        name = ' '.join(name.split())
+        if name:
+            names.setdefault(fold(name), name)
+    return list(names.values())
+
+
+def split_author_strings(apps, schema_editor):
+    # Crea un Author por cada nombre distinto de los textos "A / B" y enlaza los libros
+    Book = apps.get_model('books', 'Book')
+    Author = apps.get_model('books', 'Author')
+    Through = Book.autores.through
+
+    names = {}
+    links = []
+    for book_id, authors in Book.objects.order_by('id').values_list('id', 'authors').iterator(chunk_size=5000):
+        for name in split_authors(authors):
+            norm = fold(name)
+            names.setdefault(norm, name)
+            links.append((book_id, norm))
+
+    Author.objects.bulk_create(
+        [Author(name=name, name_norm=norm) for norm, name in names.items()],
+        batch_size=2000, ignore_conflicts=True,
+    )
+    author_ids = dict(Author.objects.values_list('name_norm', 'id'))
+    Through.objects.bulk_create(
+        [Through(book_id=book_id, author_id=author_ids[norm]) for book_id, norm in links],
+        batch_size=5000, ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0028_book_normalized_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Author',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=1024)),
+                ('name_norm', models.CharField(editable=False, max_length=1024, unique=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='autores',
+            field=models.ManyToManyField(blank=True, related_name='books', to='books.author'),
+        ),
+        migrations.RunPython(split_author_strings, migrations.RunPython.noop),
+    ]
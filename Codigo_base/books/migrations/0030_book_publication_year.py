@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:17
+
+import re
+
+from django.db import migrations, models
+
+YEAR_RE = re.compile(r'\b(\d{4})\b')
+
+
+def parse_year(value):
+    # Copia congelada de books.text.parse_year al crear esta migración
+    match = YEAR_RE.search(str(value or ''))
+    if not match:
+        return None
+    year = int(match.group(1))
+    return year if 1000 <= year <= 2100 else None
+
+
+def fill_publication_year(apps, schema_editor):
+    Book = apps.get_model('books', 'Book')
+    last_id = 0
+    while True:
+        page = list(Book.objects.filter(id__gt=last_id).order_by('id')
+                    .only('id', 'publication_date')[:2000])
+        if not page:
+            return
+        for book in page:
+            book.publication_year = parse_year(book.publication_date)
+        Book.objects.bulk_update(page, ['publication_year'])
+        last_id = page[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0029_author'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='publication_year',
+            field=models.IntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.RunPython(fill_publication_year, migrations.RunPython.noop),
+    ]
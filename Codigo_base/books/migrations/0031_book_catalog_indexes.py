@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0030_book_publication_year'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='book',
+            name='genre_norm',
+            field=models.CharField(blank=True, default='', editable=False, max_length=100),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['title'], name='book_title_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['precio'], name='book_precio_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['average_rating'], name='book_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['genre_norm', 'title'], name='book_genre_title_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['genre_norm', 'precio'], name='book_genre_precio_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['genre_norm', 'average_rating'], name='book_genre_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['genre_norm', 'publication_year'], name='book_genre_year_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['genre'], name='book_genre_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from books import ranking
+
+
+def fill_ranking(apps, schema_editor):
+    Book = apps.get_model('books', 'Book')
+    TopRanking = apps.get_model('books', 'TopRanking')
+    # C y m se guardan desde la migración 0034 (TopRankingParameters)
+    ranking.refresh(Book.objects.using(schema_editor.connection.alias), TopRanking, parameters_model=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0031_book_catalog_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TopRanking',
+            fields=[
+                ('book', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='ranking', serialize=False, to='books.book')),
+                ('score', models.FloatField()),
+            ],
+            options={
+                'ordering': ['-score', 'book'],
+                'indexes': [models.Index(fields=['-score', 'book'], name='ranking_score_idx')],
+            },
+        ),
+        migrations.RunPython(fill_ranking, migrations.RunPython.noop),
+    ]
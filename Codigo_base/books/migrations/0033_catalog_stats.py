@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0032_top_ranking'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('by_year', models.JSONField(default=list)),
+                ('by_genre', models.JSONField(default=list)),
+                ('stale', models.BooleanField(default=False)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:40
+
+from django.db import migrations, models
+
+from books import ranking
+
+
+def refresh_ranking(apps, schema_editor):
+    Book = apps.get_model('books', 'Book')
+    ranking.refresh(
+        Book.objects.using(schema_editor.connection.alias),
+        apps.get_model('books', 'TopRanking'),
+        apps.get_model('books', 'TopRankingParameters'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0033_catalog_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TopRankingParameters',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mean_rating', models.FloatField()),
+                ('min_votes', models.PositiveIntegerField()),
+                ('refreshed_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(refresh_ranking, migrations.RunPython.noop),
+    ]
@@ -4,18 +4,74 @@ from django.contrib.auth.models import User
 from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
 
+from .text import fold, parse_year, split_authors
+
 
 def get_default_array():
     default_arr = np.random.rand(1536)
     return default_arr.astype(np.float32).tobytes()
 
 
+class Author(models.Model):
+    name = models.CharField(max_length=1024)
+    # Nombre sin tildes ni mayúsculas: identifica al autor y sirve para filtrar
+    name_norm = models.CharField(max_length=1024, unique=True, editable=False)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+    def save(self, *args, **kwargs):
+        self.name_norm = fold(self.name)
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def for_names(cls, names):
+        """Autores con esos nombres, creando los que falten; en el mismo orden."""
+        by_norm = {fold(name): name for name in names}
+        existing = {a.name_norm: a for a in cls.objects.filter(name_norm__in=by_norm)}
+        missing = [cls(name=name, name_norm=norm) for norm, name in by_norm.items() if norm not in existing]
+        if missing:
+            cls.objects.bulk_create(missing, ignore_conflicts=True)
+            existing = {a.name_norm: a for a in cls.objects.filter(name_norm__in=by_norm)}
+        return [existing[norm] for norm in by_norm]
+
+    @classmethod
+    def link_books(cls, books, batch_size=5000):
+        """
+        Crea los autores y enlaces de ``books`` (un queryset de libros aún sin
+        enlazar, p. ej. recién importados) con pocas consultas por lote.
+        Devuelve cuántos enlaces se crearon.
+        """
+        through = Book.autores.through
+        total = 0
+        rows = books.order_by('id').values_list('id', 'authors').iterator(chunk_size=batch_size)
+        while True:
+            chunk = [row for _, row in zip(range(batch_size), rows)]
+            if not chunk:
+                return total
+            links = [(book_id, name) for book_id, authors in chunk for name in split_authors(authors)]
+            by_norm = {fold(name): name for _, name in links}
+            cls.objects.bulk_create([cls(name=name, name_norm=norm) for norm, name in by_norm.items()],
+                                    ignore_conflicts=True)
+            ids = dict(cls.objects.filter(name_norm__in=by_norm).values_list('name_norm', 'id'))
+            through.objects.bulk_create(
+                [through(book_id=book_id, author_id=ids[fold(name)]) for book_id, name in links],
+                ignore_conflicts=True,
+            )
+            total += len(links)
+
+
 class Book(models.Model):
     id = models.AutoField(primary_key=True)
     isbn = models.CharField(max_length=40, blank=True)
     title = models.CharField(max_length=1024, db_column='Book-Title')
     authors = models.CharField(max_length=1024, blank=True, db_column='Book-Author')
     publication_date = models.CharField(max_length=20, blank=True, null=True, db_column='Year-Of-Publication')
+    # Año como entero (derivado de publication_date) para filtrar y ordenar con índice
+    publication_year = models.IntegerField(null=True, blank=True, db_index=True, editable=False)
     publisher = models.CharField(max_length=255, blank=True, null=True)
     image_url = models.URLField(max_length=500, blank=True, null=True, db_column='Image-URL-M')
     average_rating = models.FloatField(null=True, blank=True, db_column='Average-Book-Rating')
@@ -24,11 +80,67 @@ class Book(models.Model):
     genre = models.CharField(max_length=100, blank=True, default="Sin género")
     description = models.TextField(blank=True, null=True)
     embeddings = models.JSONField(null=True, blank=True)
+    # Proveedor/modelo que generó el vector (ver books/embedding_providers.py)
+    embedding_model = models.CharField(max_length=100, blank=True, default='')
     precio = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    # Autores como filas propias; ``authors`` se conserva como texto para mostrar
+    autores = models.ManyToManyField(Author, related_name='books', blank=True)
+
+    # Copias en minúsculas y sin tildes para búsquedas que usan índice
+    title_norm = models.CharField(max_length=1024, blank=True, default='', db_index=True, editable=False)
+    authors_norm = models.CharField(max_length=1024, blank=True, default='', db_index=True, editable=False)
+    publisher_norm = models.CharField(max_length=255, blank=True, default='', db_index=True, editable=False)
+    genre_norm = models.CharField(max_length=100, blank=True, default='', editable=False)
+
+    class Meta:
+        indexes = [
+            # Órdenes del catálogo (sort_by). Cada índice incluye el id, que es
+            # el desempate, así que la página sale en orden sin ordenar aparte
+            models.Index(fields=['title'], name='book_title_idx'),
+            models.Index(fields=['precio'], name='book_precio_idx'),
+            models.Index(fields=['average_rating'], name='book_rating_idx'),
+            # Filtro por género (el más usado) combinado con cada orden; el
+            # primero también sirve para genre_norm solo
+            models.Index(fields=['genre_norm', 'title'], name='book_genre_title_idx'),
+            models.Index(fields=['genre_norm', 'precio'], name='book_genre_precio_idx'),
+            models.Index(fields=['genre_norm', 'average_rating'], name='book_genre_rating_idx'),
+            models.Index(fields=['genre_norm', 'publication_year'], name='book_genre_year_idx'),
+            # Faceta de géneros (GROUP BY genre)
+            models.Index(fields=['genre'], name='book_genre_idx'),
+        ]
+
+    NORMALIZED_FIELDS = {
+        'title': 'title_norm',
+        'authors': 'authors_norm',
+        'publisher': 'publisher_norm',
+        'genre': 'genre_norm',
+    }
 
     def __str__(self):
         return self.title
 
+    def fill_normalized_fields(self):
+        for field, norm_field in self.NORMALIZED_FIELDS.items():
+            setattr(self, norm_field, fold(getattr(self, field) or ''))
+
+    def sync_authors(self):
+        """Alinea la relación ``autores`` con el texto de ``authors``."""
+        self.autores.set(Author.for_names(split_authors(self.authors)))
+
+    def fill_derived_fields(self):
+        self.fill_normalized_fields()
+        self.publication_year = parse_year(self.publication_date)
+
+    def save(self, *args, **kwargs):
+        self.fill_derived_fields()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            derived = {**self.NORMALIZED_FIELDS, 'publication_date': 'publication_year'}
+            kwargs['update_fields'] = set(update_fields) | {
+                derived[field] for field in update_fields if field in derived
+            }
+        super().save(*args, **kwargs)
+
 
 # Modelo de Favoritos
 class Favorite(models.Model):
@@ -151,3 +263,79 @@ class Review(models.Model):
 
     def __str__(self):
         return f"{self.user.username} - {self.book.title} ({self.rating}⭐)"
+
+
+# Vecinos precalculados por similitud de embeddings (compute_similar_books)
+class SimilarBook(models.Model):
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='similar_entries')
+    similar = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        ordering = ['book', 'rank']
+        unique_together = ('book', 'rank')
+
+    def __str__(self):
+        return f"{self.book_id} → {self.similar_id} ({self.score:.3f})"
+
+
+# Ranking materializado por calificación ponderada (books/ranking.py)
+class TopRanking(models.Model):
+    book = models.OneToOneField(Book, on_delete=models.CASCADE, primary_key=True, related_name='ranking')
+    score = models.FloatField()
+
+    class Meta:
+        ordering = ['-score', 'book']
+        indexes = [models.Index(fields=['-score', 'book'], name='ranking_score_idx')]
+
+    def __str__(self):
+        return f"{self.book_id} ({self.score:.3f})"
+
+
+# Parámetros con los que se calculó el ranking (una sola fila)
+class TopRankingParameters(models.Model):
+    mean_rating = models.FloatField()   # C: promedio de calificaciones del catálogo
+    min_votes = models.PositiveIntegerField()  # m
+    refreshed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"C = {self.mean_rating:.3f}, m = {self.min_votes}"
+
+
+# Conteos del catálogo para la página de estadísticas (books/stats.py)
+class CatalogStats(models.Model):
+    by_year = models.JSONField(default=list)   # [[año o "Sin año", cantidad], ...]
+    by_genre = models.JSONField(default=list)  # [[género, cantidad], ...]
+    stale = models.BooleanField(default=False)
+    computed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Estadísticas del catálogo ({self.computed_at:%Y-%m-%d %H:%M})"
+
+
+# Caché persistente de embeddings de prompts del recomendador
+class PromptEmbedding(models.Model):
+    key = models.CharField(max_length=64, unique=True)
+    prompt = models.TextField()
+    model = models.CharField(max_length=100)
+    vector = models.BinaryField()
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"{self.prompt[:50]} ({self.model})"
+
+
+# Vector de gustos del usuario: suma de embeddings de sus favoritos, compras y
+# reseñas, mantenida de forma incremental por señales (ver books/taste.py)
+class UserTaste(models.Model):
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='taste')
+    vector_sum = models.BinaryField()
+    count = models.PositiveIntegerField(default=0)
+    store_version = models.CharField(max_length=40)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Gustos de {self.user.username} ({self.count} libros)"
@@ -0,0 +1,159 @@
+"""
+Paginación del catálogo: listas de ids ya ordenadas (``BooksById``) y
+paginación por cursor sobre un queryset (``keyset_page``).
+"""
+import base64
+import json
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q
+
+from .models import Book
+
+
+class BooksById:
+    """
+    Secuencia perezosa de libros a partir de ids ya ordenados (por relevancia,
+    por ejemplo). ``Paginator`` solo pide la porción de la página actual, así
+    que cada página es un único ``in_bulk`` en lugar de cargar todos los libros.
+
+    Si ``ids`` es solo el comienzo del resultado, ``total`` da su tamaño real
+    y las porciones que caen fuera de ``ids`` se piden a ``overflow`` (el
+    queryset ordenado completo).
+    """
+
+    def __init__(self, ids, queryset=None, total=None, overflow=None):
+        self.ids = list(ids)
+        self.queryset = queryset if queryset is not None else Book.objects.all()
+        self.total = len(self.ids) if total is None else total
+        self.overflow = overflow
+
+    def __len__(self):
+        return self.total
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            stop = self.total if index.stop is None else index.stop
+            if self.overflow is not None and stop > len(self.ids):
+                return list(self.overflow[index])
+            ids = self.ids[index]
+            books = self.queryset.in_bulk(ids)
+            return [books[i] for i in ids if i in books]
+        return self[index:index + 1][0]
+
+
+# -------------------------------------------------------
+# Paginación por cursor (keyset)
+# -------------------------------------------------------
+# sort_by -> (campo, descendente). El id desempata en la misma dirección, así
+# el orden completo sale de recorrer el índice del campo (que incluye el id)
+SORT_FIELDS = {
+    'price_low': ('precio', False),
+    'price_high': ('precio', True),
+    'rating_high': ('average_rating', True),
+    'rating_low': ('average_rating', False),
+    'year_new': ('publication_year', True),
+    'year_old': ('publication_year', False),
+    'title_az': ('title', False),
+    'title_za': ('title', True),
+}
+DEFAULT_SORT = 'title_az'
+
+
+def sort_ordering(sort_by, reverse=False):
+    """
+    ``order_by`` completo para un ``sort_by``: campo con los nulos siempre al
+    final y el id como desempate, así el orden es total y un cursor identifica
+    una posición exacta. ``reverse`` invierte todo (para ir hacia atrás).
+    """
+    field, descending = SORT_FIELDS.get(sort_by, SORT_FIELDS[DEFAULT_SORT])
+    nulls = {'nulls_first': True} if reverse else {'nulls_last': True}
+    if descending != reverse:
+        return [F(field).desc(**nulls), '-id']
+    return [F(field).asc(**nulls), 'id']
+
+
+def _beyond(field, descending, value, book_id, reverse):
+    """Filtro de los libros que van después (o antes, con ``reverse``) de la posición."""
+    cmp = 'gt' if descending == reverse else 'lt'
+    if value is None:
+        # Los nulos van al final: antes de ellos están todos los no nulos
+        same = Q(**{f'{field}__isnull': True, f'id__{cmp}': book_id})
+        return same | Q(**{f'{field}__isnull': False}) if reverse else same
+    condition = Q(**{f'{field}__{cmp}': value}) | Q(**{field: value, f'id__{cmp}': book_id})
+    return condition if reverse else condition | Q(**{f'{field}__isnull': True})
+
+
+def encode_cursor(sort_by, book, direction):
+    field, _ = SORT_FIELDS.get(sort_by, SORT_FIELDS[DEFAULT_SORT])
+    value = getattr(book, field)
+    if isinstance(value, Decimal):
+        value = str(value)
+    data = json.dumps({'s': sort_by, 'v': value, 'i': book.id, 'd': direction}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token, sort_by):
+    """Posición guardada en el cursor, o ``None`` si no es válido para este orden."""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        value = data['v']
+        if data['s'] != sort_by or data['d'] not in ('next', 'prev'):
+            return None
+        # Un cursor manipulado no puede meter listas, objetos ni booleanos en el
+        # filtro, ni un valor que no sea del tipo del campo ("abc" en el precio)
+        if value is not None:
+            if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+                return None
+            field, _ = SORT_FIELDS.get(sort_by, SORT_FIELDS[DEFAULT_SORT])
+            value = Book._meta.get_field(field).to_python(value)
+        return value, int(data['i']), data['d']
+    except (ValueError, TypeError, KeyError, ValidationError):
+        return None
+
+
+class KeysetPage:
+    """Página obtenida por cursor: sin número de página ni conteo total."""
+
+    def __init__(self, object_list, sort_by, has_next, has_previous):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.next_cursor = encode_cursor(sort_by, object_list[-1], 'next') if has_next else None
+        self.previous_cursor = encode_cursor(sort_by, object_list[0], 'prev') if has_previous else None
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+
+def keyset_queryset(queryset, sort_by, position):
+    """``queryset`` ordenado y recortado a lo que sigue a ``position`` (ver ``decode_cursor``)."""
+    field, descending = SORT_FIELDS.get(sort_by, SORT_FIELDS[DEFAULT_SORT])
+    reverse = position is not None and position[2] == 'prev'
+    queryset = queryset.order_by(*sort_ordering(sort_by, reverse))
+    if position is not None:
+        value, book_id, _ = position
+        queryset = queryset.filter(_beyond(field, descending, value, book_id, reverse))
+    return queryset
+
+
+def keyset_page(queryset, sort_by, cursor, per_page):
+    """
+    Página de ``per_page`` libros a partir de ``cursor``. Cada página es una
+    consulta con ``LIMIT per_page + 1`` sobre el índice del orden, sin
+    ``OFFSET`` ni ``COUNT``, así que la página N cuesta lo mismo que la 1.
+    """
+    position = decode_cursor(cursor, sort_by) if cursor else None
+    reverse = position is not None and position[2] == 'prev'
+
+    rows = list(keyset_queryset(queryset, sort_by, position)[:per_page + 1])
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    if reverse:
+        rows.reverse()
+        return KeysetPage(rows, sort_by, has_next=bool(rows), has_previous=more)
+    return KeysetPage(rows, sort_by, has_next=more, has_previous=position is not None and bool(rows))
@@ -0,0 +1,106 @@
+"""
+Caché de dos niveles para los embeddings de prompts.
+
+1. LRU en memoria del proceso (lo más rápido, se pierde al reiniciar).
+2. Tabla ``PromptEmbedding`` compartida por todos los workers.
+
+La clave es el prompt normalizado más el nombre del modelo de embeddings, así
+que cambiar de modelo nunca devuelve vectores de otro espacio. La tabla se
+recorta a ``db_size`` cada ``evict_every`` inserciones del proceso (no en cada
+una: contar las filas no es gratis), así que puede pasarse un poco del límite.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .models import PromptEmbedding
+
+
+def normalize_prompt(prompt):
+    """Minúsculas y espacios colapsados: "Novela  de Misterio" == "novela de misterio"."""
+    return " ".join(prompt.lower().split())
+
+
+def cache_key(prompt, model):
+    text = f"{model}\n{normalize_prompt(prompt)}"
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class PromptEmbeddingCache:
+    def __init__(self, memory_size=512, db_size=20000, evict_every=100):
+        self.memory_size = memory_size
+        self.db_size = db_size
+        self.evict_every = evict_every
+        self._inserts = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'memory_hits': 0, 'db_hits': 0, 'misses': 0}
+
+    def get(self, prompt, model, compute):
+        """
+        Devuelve el embedding del prompt. ``compute(texto)`` solo se llama si
+        no está en ninguno de los dos niveles.
+        """
+        key = cache_key(prompt, model)
+
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.stats['memory_hits'] += 1
+                return vector
+
+        entry = PromptEmbedding.objects.filter(key=key).only('vector').first()
+        if entry is not None:
+            vector = np.frombuffer(bytes(entry.vector), dtype=np.float32)
+            PromptEmbedding.objects.filter(pk=entry.pk).update(
+                hits=F('hits') + 1, last_used_at=timezone.now()
+            )
+            self._remember(key, vector, 'db_hits')
+            return vector
+
+        vector = np.asarray(compute(prompt), dtype=np.float32)
+        PromptEmbedding.objects.update_or_create(
+            key=key,
+            defaults={'prompt': normalize_prompt(prompt), 'model': model,
+                      'vector': vector.tobytes(), 'last_used_at': timezone.now()},
+        )
+        with self._lock:
+            self._inserts += 1
+            evict = self._inserts % self.evict_every == 0
+        if evict:
+            self._evict_db()
+        self._remember(key, vector, 'misses')
+        return vector
+
+    def _remember(self, key, vector, counter):
+        with self._lock:
+            self.stats[counter] += 1
+            self._memory[key] = vector
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+    def _evict_db(self):
+        """Borra de la tabla los prompts usados hace más tiempo si se pasa del límite."""
+        excess = PromptEmbedding.objects.count() - self.db_size
+        if excess > 0:
+            old_ids = list(PromptEmbedding.objects.order_by('last_used_at')
+                           .values_list('id', flat=True)[:excess])
+            PromptEmbedding.objects.filter(id__in=old_ids).delete()
+
+    def clear_memory(self):
+        with self._lock:
+            self._memory.clear()
+
+
+prompt_embedding_cache = PromptEmbeddingCache(
+    memory_size=getattr(settings, 'PROMPT_CACHE_MEMORY_SIZE', 512),
+    db_size=getattr(settings, 'PROMPT_CACHE_DB_SIZE', 20000),
+    evict_every=getattr(settings, 'PROMPT_CACHE_EVICT_EVERY', 100),
+)
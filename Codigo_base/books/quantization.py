@@ -0,0 +1,105 @@
+"""
+Representaciones compactas de la matriz de embeddings.
+
+- ``float16``: la mitad de memoria, casi sin pérdida.
+- ``int8``: una cuarta parte, cuantización escalar con un factor de escala
+  por vector (``x ≈ codes * scale``, ``scale = max|x| / 127``).
+
+La búsqueda de candidatos corre sobre la versión cuantizada (que cabe completa
+en RAM en cada worker) y solo un conjunto pequeño se vuelve a puntuar con la
+matriz float32, que sigue en disco con mmap y solo carga las filas pedidas.
+"""
+import os
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+KINDS = ('float16', 'int8')
+
+
+def _temp_path(directory, prefix):
+    # Nombre único: dos procesos guardando a la vez no pisan sus temporales
+    fd, path = tempfile.mkstemp(dir=directory, prefix=prefix, suffix='.npy')
+    os.close(fd)
+    return Path(path)
+
+
+class QuantizedMatrix:
+    def __init__(self, kind, codes, scales=None):
+        if kind not in KINDS:
+            raise ValueError(f"Cuantización desconocida: {kind}")
+        self.kind = kind
+        self.codes = codes
+        self.scales = scales
+
+    def __len__(self):
+        return len(self.codes)
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    @classmethod
+    def from_matrix(cls, matrix, kind, block_size=8192):
+        """Cuantiza la matriz float32 por bloques (sirve también sobre un mmap)."""
+        if kind not in KINDS:
+            raise ValueError(f"Cuantización desconocida: {kind}")
+        n = len(matrix)
+        dim = matrix.shape[1] if matrix.ndim == 2 else 0
+        if kind == 'float16':
+            codes = np.empty((n, dim), dtype=np.float16)
+            for start in range(0, n, block_size):
+                codes[start:start + block_size] = matrix[start:start + block_size]
+            return cls(kind, codes)
+
+        codes = np.empty((n, dim), dtype=np.int8)
+        scales = np.empty(n, dtype=np.float32)
+        for start in range(0, n, block_size):
+            block = np.asarray(matrix[start:start + block_size], dtype=np.float32)
+            scale = np.abs(block).max(axis=1) / 127.0
+            scale[scale == 0] = 1.0
+            codes[start:start + len(block)] = np.round(block / scale[:, None]).astype(np.int8)
+            scales[start:start + len(block)] = scale
+        return cls(kind, codes, scales)
+
+    def scores(self, query, block_size=16384):
+        """Similitudes aproximadas de todas las filas contra ``query``."""
+        query = np.asarray(query, dtype=np.float32)
+        out = np.empty(len(self.codes), dtype=np.float32)
+        for start in range(0, len(self.codes), block_size):
+            block = self.codes[start:start + block_size].astype(np.float32)
+            out[start:start + len(block)] = block @ query
+        if self.scales is not None:
+            out *= self.scales
+        return out
+
+    # ---------------------------------------------------
+    # Persistencia (junto al almacén de embeddings)
+    # ---------------------------------------------------
+    def save(self, directory):
+        """
+        Escribe códigos y escalas en archivos nuevos (nombre único) y devuelve
+        sus nombres; quien guarda los publica junto con la matriz.
+        """
+        directory = Path(directory)
+        files = {'kind': self.kind, 'codes': None, 'scales': None}
+        if self.scales is not None:
+            path = _temp_path(directory, f'scales.{self.kind}.')
+            np.save(path, self.scales)
+            files['scales'] = path.name
+        path = _temp_path(directory, f'codes.{self.kind}.')
+        np.save(path, self.codes)
+        files['codes'] = path.name
+        return files
+
+    @classmethod
+    def load(cls, directory, files):
+        """Carga en memoria la versión guardada por ``save``, o ``None`` si no existe."""
+        directory = Path(directory)
+        try:
+            codes = np.load(directory / files['codes'])
+            scales = np.load(directory / files['scales']) if files['scales'] else None
+        except FileNotFoundError:
+            return None
+        return cls(files['kind'], codes, scales)
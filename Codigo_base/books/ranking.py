@@ -0,0 +1,91 @@
+"""
+Ranking de los mejores libros por calificación ponderada (bayesiana).
+
+Ordenar por ``average_rating`` pone un libro con una sola reseña de 5
+estrellas por encima de clásicos con miles de calificaciones. El puntaje
+acerca el promedio de cada libro al promedio del catálogo según cuántas
+calificaciones tiene::
+
+    WR = v / (v + m) * R + m / (v + m) * C
+
+- R: calificación promedio del libro; v: ``ratings_count``.
+- C: promedio de ``average_rating`` en el catálogo.
+- m: calificaciones necesarias para pesar tanto como el promedio
+  (``TOP_RANKING_MIN_VOTES``).
+
+Los puntajes se guardan en ``TopRanking`` (un índice sobre el puntaje), así
+el Top 100 y las secciones de "mejor valorados" son una consulta indexada.
+``manage.py refresh_top_ranking`` lo rehace completo y guarda C y m en
+``TopRankingParameters``; después, cada libro se actualiza con señales al
+cambiar su calificación usando esos mismos C y m (hasta la próxima
+reconstrucción, p. ej. tras importar libros).
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Avg
+
+from .models import Book, TopRanking, TopRankingParameters
+
+
+def min_votes():
+    return getattr(settings, 'TOP_RANKING_MIN_VOTES', 50)
+
+
+def weighted_rating(rating, votes, mean, m):
+    votes = votes or 0
+    if votes + m == 0:
+        return rating
+    return votes / (votes + m) * rating + m / (votes + m) * mean
+
+
+def catalog_mean(books=None):
+    books = Book.objects.all() if books is None else books
+    return books.filter(average_rating__isnull=False).aggregate(mean=Avg('average_rating'))['mean']
+
+
+def refresh(books=None, ranking_model=TopRanking, parameters_model=TopRankingParameters, chunk_size=5000):
+    """
+    Recalcula todo el ranking y guarda C y m. ``books`` y los modelos pueden
+    ser históricos (migraciones). Devuelve cuántos libros quedaron.
+    """
+    books = Book.objects.all() if books is None else books
+    mean = catalog_mean(books)
+    m = min_votes()
+    total = 0
+    with transaction.atomic(using=books.db):
+        ranking_model.objects.using(books.db).all().delete()
+        chunk = []
+        rated = books.filter(average_rating__isnull=False).values_list('id', 'average_rating', 'ratings_count')
+        for book_id, rating, votes in rated.iterator(chunk_size=chunk_size):
+            chunk.append(ranking_model(book_id=book_id, score=weighted_rating(rating, votes, mean, m)))
+            if len(chunk) >= chunk_size:
+                ranking_model.objects.using(books.db).bulk_create(chunk)
+                total += len(chunk)
+                chunk = []
+        ranking_model.objects.using(books.db).bulk_create(chunk)
+        # Sin libros calificados no hay C: no se guarda nada hasta la próxima reconstrucción
+        if parameters_model is not None:
+            parameters_model.objects.using(books.db).all().delete()
+            if mean is not None:
+                parameters_model.objects.using(books.db).create(mean_rating=mean, min_votes=m)
+    return total + len(chunk)
+
+
+def update_book(book):
+    """
+    Actualiza (o quita) el puntaje de un libro con su calificación actual y
+    los C y m de la última reconstrucción. Sin reconstrucción no hace nada.
+    """
+    if book.average_rating is None:
+        TopRanking.objects.filter(book_id=book.id).delete()
+        return
+    parameters = TopRankingParameters.objects.first()
+    if parameters is None:
+        return
+    score = weighted_rating(book.average_rating, book.ratings_count, parameters.mean_rating, parameters.min_votes)
+    TopRanking.objects.update_or_create(book_id=book.id, defaults={'score': score})
+
+
+def top_books(limit):
+    """Los ``limit`` libros mejor puntuados, del primero al último."""
+    return Book.objects.filter(ranking__isnull=False).order_by('-ranking__score', 'ranking__book')[:limit]
@@ -0,0 +1,35 @@
+"""
+Caché de resultados del catálogo.
+
+Para cada combinación de filtros y orden se guarda la lista ordenada de ids
+que coinciden y el total. Las páginas siguientes se sirven cortando esa
+lista y trayendo solo sus libros con ``in_bulk``, sin repetir el filtrado,
+el ordenamiento ni el ``COUNT``.
+
+Las claves llevan la versión del catálogo, así que cualquier cambio en los
+libros las invalida. Cada entrada guarda como mucho ``RESULT_CACHE_MAX_IDS``
+ids; las páginas más allá se piden a la base de datos (para eso está la
+paginación por cursor).
+"""
+from django.conf import settings
+
+from .cache import cached
+from .pagination import BooksById
+
+
+def cached_results(queryset, *key_parts, namespaces='catalog'):
+    """
+    ``BooksById`` con el resultado de ``queryset`` (ya filtrado y ordenado).
+    ``key_parts`` identifica la consulta, p. ej. la firma de filtros y el orden;
+    ``namespaces``, las versiones de las que depende.
+    """
+    max_ids = getattr(settings, 'RESULT_CACHE_MAX_IDS', 5000)
+
+    def compute():
+        ids = list(queryset.values_list('id', flat=True)[:max_ids + 1])
+        total = len(ids) if len(ids) <= max_ids else queryset.count()
+        return ids[:max_ids], total
+
+    ids, total = cached(namespaces, ('results',) + key_parts, compute,
+                        getattr(settings, 'RESULT_CACHE_TIMEOUT', 300))
+    return BooksById(ids, total=total, overflow=queryset if total > len(ids) else None)
@@ -0,0 +1,58 @@
+"""
+Muestras aleatorias del catálogo ("descubre" de la portada).
+
+En lugar de cargar todos los libros para elegir unos pocos, cada proceso
+guarda los ids del catálogo barajados (un anillo) y va entregando porciones
+consecutivas: cada muestra es distinta de las anteriores hasta dar la vuelta,
+y entonces se vuelve a barajar. Solo se piden a la base de datos los libros
+elegidos, sin sus columnas pesadas.
+
+El anillo es un ``cache.ProcessLocal`` (``SAMPLE_POOL_REFRESH_INTERVAL``).
+"""
+import random
+import threading
+
+from .cache import ProcessLocal
+from .models import Book
+
+# Columnas que las tarjetas de libro no muestran
+HEAVY_FIELDS = ('description', 'embeddings')
+
+
+class SampleRing:
+
+    def __init__(self, ids):
+        self.ids = list(ids)
+        random.shuffle(self.ids)
+        self.position = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls):
+        return cls(Book.objects.values_list('id', flat=True).iterator(chunk_size=10000))
+
+    def take(self, k):
+        with self._lock:
+            if len(self.ids) <= k:
+                return list(self.ids)
+            if self.position + k > len(self.ids):
+                random.shuffle(self.ids)
+                self.position = 0
+            chosen = self.ids[self.position:self.position + k]
+            self.position += k
+            return chosen
+
+
+_ring = ProcessLocal(SampleRing.load, 'SAMPLE_POOL_REFRESH_INTERVAL', 300)
+
+
+def get_sample_ring():
+    return _ring.get()
+
+
+def random_books(k=8):
+    """Hasta ``k`` libros al azar (con las columnas pesadas diferidas)."""
+    ids = get_sample_ring().take(k)
+    books = Book.objects.defer(*HEAVY_FIELDS).in_bulk(ids)
+    # Un libro borrado desde la última recarga simplemente no aparece
+    return [books[i] for i in ids if i in books]
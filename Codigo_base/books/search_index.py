@@ -0,0 +1,214 @@
+"""
+Índice de texto completo del catálogo.
+
+- SQLite: tabla virtual FTS5 ``books_book_fts`` (``rowid`` = id del libro),
+  ordenada con ``bm25()`` dando más peso al título que al autor, género y
+  editorial.
+- PostgreSQL: tabla ``books_book_search`` con un ``tsvector`` (pesos A-D por
+  campo) e índice GIN, ordenada con ``ts_rank_cd``.
+- Otros motores (o un SQLite compilado sin FTS5): no hay índice y las vistas
+  buscan por prefijo en las columnas normalizadas de ``Book``.
+
+El texto se indexa ya normalizado con ``text.fold`` (sin tildes ni
+mayúsculas), igual que las consultas. El índice se mantiene con señales de
+``Book`` y se reconstruye con ``manage.py rebuild_search_index``.
+"""
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .text import fold, prefix_q, tokens
+
+FTS_TABLE = 'books_book_fts'
+PG_TABLE = 'books_book_search'
+FIELDS = ('title', 'authors', 'genre', 'publisher')
+# Pesos BM25 por columna, en el orden de FIELDS
+BM25_WEIGHTS = (10.0, 5.0, 2.0, 1.0)
+PG_WEIGHTS = ('A', 'B', 'C', 'D')
+
+# (alias, base de datos) -> si existe la tabla del índice
+_available = {}
+
+
+# -------------------------------------------------------
+# Esquema (lo crea la migración 0027)
+# -------------------------------------------------------
+def is_available(using=DEFAULT_DB_ALIAS):
+    """Si la base de datos tiene el índice creado."""
+    connection = connections[using]
+    key = (using, connection.settings_dict['NAME'])
+    if key not in _available:
+        table = {'sqlite': FTS_TABLE, 'postgresql': PG_TABLE}.get(connection.vendor)
+        _available[key] = bool(table) and table in connection.introspection.table_names()
+    return _available[key]
+
+
+# -------------------------------------------------------
+# Mantenimiento
+# -------------------------------------------------------
+def _row(book):
+    return [book.id] + [fold(getattr(book, field) or '') for field in FIELDS]
+
+
+def index_books(books, using=DEFAULT_DB_ALIAS):
+    """Inserta o reemplaza las entradas de ``books`` en el índice."""
+    if not is_available(using):
+        return
+    rows = [_row(book) for book in books]
+    if not rows:
+        return
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [[row[0]] for row in rows])
+            cursor.executemany(
+                f"INSERT INTO {FTS_TABLE} (rowid, {', '.join(FIELDS)}) VALUES (%s, %s, %s, %s, %s)",
+                rows,
+            )
+        else:
+            document = ' || '.join(
+                f"setweight(to_tsvector('simple', %s), '{weight}')" for weight in PG_WEIGHTS
+            )
+            cursor.executemany(
+                f"INSERT INTO {PG_TABLE} (book_id, document) VALUES (%s, {document}) "
+                f"ON CONFLICT (book_id) DO UPDATE SET document = EXCLUDED.document",
+                rows,
+            )
+
+
+def remove_books(book_ids, using=DEFAULT_DB_ALIAS):
+    if not is_available(using) or not book_ids:
+        return
+    connection = connections[using]
+    table, column = (FTS_TABLE, 'rowid') if connection.vendor == 'sqlite' else (PG_TABLE, 'book_id')
+    with connection.cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {table} WHERE {column} = %s", [[book_id] for book_id in book_ids])
+
+
+def rebuild(books, using=DEFAULT_DB_ALIAS, chunk_size=2000):
+    """
+    Vacía el índice y lo vuelve a llenar con ``books`` (un queryset).
+    Devuelve cuántos libros se indexaron.
+    """
+    if not is_available(using):
+        return 0
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE if connection.vendor == 'sqlite' else PG_TABLE}")
+    total = 0
+    chunk = []
+    for book in books.only('id', *FIELDS).order_by('id').iterator(chunk_size=chunk_size):
+        chunk.append(book)
+        if len(chunk) >= chunk_size:
+            index_books(chunk, using)
+            total += len(chunk)
+            chunk = []
+    index_books(chunk, using)
+    return total + len(chunk)
+
+
+# -------------------------------------------------------
+# Consultas
+# -------------------------------------------------------
+def match_expression(query, vendor):
+    """
+    Traduce el texto del usuario a la sintaxis del motor: deben aparecer
+    todas las palabras, cada una como prefijo para que sirvan palabras a
+    medio escribir. Devuelve '' si no hay palabras.
+    """
+    words = tokens(query)
+    if not words:
+        return ''
+    if vendor == 'sqlite':
+        return ' '.join(f'"{word}"*' for word in words)
+    return ' & '.join(f'{word}:*' for word in words)
+
+
+def search_ids(query, limit=1000, offset=0, using=DEFAULT_DB_ALIAS):
+    """
+    Ids de los libros que coinciden, del más al menos relevante (``limit``
+    a partir de la posición ``offset``). Devuelve ``None`` si no hay índice
+    (ver ``filter_queryset``).
+    """
+    if not is_available(using):
+        return None
+    connection = connections[using]
+    expression = match_expression(query, connection.vendor)
+    if not expression:
+        return []
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            weights = ', '.join(str(weight) for weight in BM25_WEIGHTS)
+            cursor.execute(
+                f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+                f"ORDER BY bm25({FTS_TABLE}, {weights}), rowid LIMIT %s OFFSET %s",
+                [expression, limit, offset],
+            )
+        else:
+            cursor.execute(
+                f"SELECT book_id FROM {PG_TABLE}, to_tsquery('simple', %s) AS query "
+                f"WHERE document @@ query ORDER BY ts_rank_cd(document, query) DESC, book_id LIMIT %s OFFSET %s",
+                [expression, limit, offset],
+            )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def count_matches(query, using=DEFAULT_DB_ALIAS):
+    """Cuántos libros coinciden (``None`` si no hay índice)."""
+    if not is_available(using):
+        return None
+    connection = connections[using]
+    expression = match_expression(query, connection.vendor)
+    if not expression:
+        return 0
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f"SELECT COUNT(*) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [expression])
+        else:
+            cursor.execute(
+                f"SELECT COUNT(*) FROM {PG_TABLE} WHERE document @@ to_tsquery('simple', %s)", [expression]
+            )
+        return cursor.fetchone()[0]
+
+
+class Matches:
+    """
+    Libros que coinciden, en orden de relevancia, pedidos al índice por
+    porciones (``LIMIT``/``OFFSET``). Sirve de ``overflow`` de
+    ``pagination.BooksById`` para las páginas más allá de los primeros ids.
+    """
+
+    def __init__(self, query, queryset, using=DEFAULT_DB_ALIAS):
+        self.query = query
+        self.queryset = queryset
+        self.using = using
+
+    def __getitem__(self, index):
+        start = index.start or 0
+        ids = search_ids(self.query, index.stop - start, start, using=self.using)
+        books = self.queryset.in_bulk(ids)
+        return [books[i] for i in ids if i in books]
+
+
+def filter_queryset(queryset, query, using=DEFAULT_DB_ALIAS):
+    """
+    Restringe ``queryset`` a los libros que coinciden con ``query`` sin
+    cambiar su orden, para combinarlo con otros filtros. Sin índice busca
+    por prefijo en las columnas normalizadas (que sí tienen índice B-tree).
+    """
+    if not is_available(using):
+        return queryset.filter(
+            prefix_q('title_norm', query) |
+            prefix_q('authors_norm', query) |
+            prefix_q('publisher_norm', query) |
+            Q(genre_norm=fold(query).strip())
+        )
+    vendor = connections[using].vendor
+    expression = match_expression(query, vendor)
+    if not expression:
+        return queryset.none()
+    if vendor == 'sqlite':
+        matches = RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [expression])
+    else:
+        matches = RawSQL(f"SELECT book_id FROM {PG_TABLE} WHERE document @@ to_tsquery('simple', %s)", [expression])
+    return queryset.filter(id__in=matches)
@@ -0,0 +1,188 @@
+import functools
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import ranking, search_index, stats, typeahead
+from .cache import bump_version
+from .models import Book, Favorite, Order, OrderItem, Review
+from .taste import apply_taste_event
+
+# -------------------------------------------------------
+# 📦 Cargas masivas
+# -------------------------------------------------------
+_bulk_loading = ContextVar('bulk_loading', default=False)
+
+
+@contextmanager
+def bulk_loading():
+    """
+    Dentro del bloque los receptores de este módulo no hacen nada. Para
+    importaciones: quien lo usa debe reconstruir después, de una vez, lo que
+    mantienen las señales (ver ``import_books``).
+    """
+    token = _bulk_loading.set(True)
+    try:
+        yield
+    finally:
+        _bulk_loading.reset(token)
+
+
+def unless_bulk_loading(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _bulk_loading.get():
+            return func(*args, **kwargs)
+    return wrapper
+
+
+# -------------------------------------------------------
+# 🧭 Vector de gustos del usuario
+# -------------------------------------------------------
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=Review)
+@unless_bulk_loading
+def add_to_taste(sender, instance, created, **kwargs):
+    if created:
+        apply_taste_event(instance.user_id, instance.book_id, 1)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=Review)
+@unless_bulk_loading
+def remove_from_taste(sender, instance, **kwargs):
+    apply_taste_event(instance.user_id, instance.book_id, -1)
+
+
+@receiver(post_save, sender=OrderItem)
+@unless_bulk_loading
+def add_order_item_to_taste(sender, instance, created, **kwargs):
+    if created:
+        apply_taste_event(instance.order.user_id, instance.book_id, 1)
+
+
+@receiver(post_delete, sender=OrderItem)
+@unless_bulk_loading
+def remove_order_item_from_taste(sender, instance, **kwargs):
+    try:
+        user_id = instance.order.user_id
+    except OrderItem.order.RelatedObjectDoesNotExist:
+        return
+    apply_taste_event(user_id, instance.book_id, -1)
+
+
+# -------------------------------------------------------
+# 👤 Autores
+# -------------------------------------------------------
+@receiver(post_save, sender=Book)
+@unless_bulk_loading
+def sync_book_authors(sender, instance, update_fields=None, raw=False, **kwargs):
+    if raw or (update_fields is not None and 'authors' not in update_fields):
+        return
+    instance.sync_authors()
+
+
+# -------------------------------------------------------
+# 🔍 Índice de texto completo
+# -------------------------------------------------------
+@receiver(post_save, sender=Book)
+@unless_bulk_loading
+def index_book(sender, instance, update_fields=None, using=None, **kwargs):
+    # Guardar solo calificaciones, precio, etc. no cambia el texto indexado
+    if update_fields is not None and not set(update_fields) & set(search_index.FIELDS):
+        return
+    search_index.index_books([instance], using=using)
+
+
+@receiver(post_delete, sender=Book)
+@unless_bulk_loading
+def unindex_book(sender, instance, using=None, **kwargs):
+    search_index.remove_books([instance.id], using=using)
+
+
+# -------------------------------------------------------
+# 🏆 Ranking por calificación ponderada
+# -------------------------------------------------------
+RANKING_FIELDS = {'average_rating', 'ratings_count'}
+
+
+@receiver(post_save, sender=Book)
+@unless_bulk_loading
+def update_ranking(sender, instance, update_fields=None, raw=False, **kwargs):
+    if raw or (update_fields is not None and not set(update_fields) & RANKING_FIELDS):
+        return
+    ranking.update_book(instance)
+
+
+# -------------------------------------------------------
+# 📊 Estadísticas del catálogo (se recalculan en la próxima visita)
+# -------------------------------------------------------
+STATS_FIELDS = {'genre', 'publication_date', 'publication_year'}
+
+
+@receiver(post_save, sender=Book)
+@unless_bulk_loading
+def book_stats_changed(sender, instance, update_fields=None, raw=False, **kwargs):
+    if raw or (update_fields is not None and not set(update_fields) & STATS_FIELDS):
+        return
+    stats.mark_stale()
+
+
+@receiver(post_delete, sender=Book)
+@unless_bulk_loading
+def book_stats_deleted(sender, instance, **kwargs):
+    stats.mark_stale()
+
+
+# -------------------------------------------------------
+# ⚡ Versiones de caché (ver books/cache.py)
+# -------------------------------------------------------
+CACHE_NAMESPACES = {
+    Book: 'catalog',
+    Review: 'reviews',
+    Order: 'orders',
+    OrderItem: 'orders',
+    Favorite: 'favorites',
+}
+
+
+@unless_bulk_loading
+def bump_cache_version(sender, update_fields=None, **kwargs):
+    # Las reseñas solo tocan la calificación del libro: no invalidan el catálogo
+    if sender is Book and update_fields is not None and set(update_fields) <= RANKING_FIELDS:
+        bump_version('ratings')
+        return
+    bump_version(CACHE_NAMESPACES[sender])
+
+
+for model in CACHE_NAMESPACES:
+    post_save.connect(bump_cache_version, sender=model, dispatch_uid=f'bump_cache_version_save_{model.__name__}')
+    post_delete.connect(bump_cache_version, sender=model, dispatch_uid=f'bump_cache_version_delete_{model.__name__}')
+
+
+# -------------------------------------------------------
+# 🔤 Autocompletado (después de subir la versión del catálogo)
+# -------------------------------------------------------
+TYPEAHEAD_FIELDS = {'title', 'authors', 'ratings_count', 'average_rating'}
+
+
+@receiver(post_save, sender=Book)
+@unless_bulk_loading
+def update_typeahead(sender, instance, update_fields=None, **kwargs):
+    index = typeahead.loaded_index()
+    if index is None:
+        return
+    if update_fields is None or set(update_fields) & TYPEAHEAD_FIELDS:
+        index.update_book(instance)
+    typeahead.mark_current(index)
+
+
+@receiver(post_delete, sender=Book)
+@unless_bulk_loading
+def remove_from_typeahead(sender, instance, **kwargs):
+    index = typeahead.loaded_index()
+    if index is not None:
+        index.remove_book(instance.id)
+        typeahead.mark_current(index)
@@ -0,0 +1,124 @@
+"""
+Motor de similitud vectorizado.
+
+Todas las búsquedas por similitud de coseno pasan por aquí: los vectores se
+normalizan una sola vez, los candidatos se puntúan con un único producto
+matriz-vector (o matriz-matriz para lotes) y el top-k se elige con
+``argpartition`` en lugar de ordenar la lista completa.
+"""
+import numpy as np
+from django.conf import settings
+
+
+def normalize(vectors):
+    """Normaliza (por filas) a norma 1. Los vectores nulos quedan en cero."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _select_top(scores, k):
+    """Índices de los k mayores puntajes de un vector 1D, ya ordenados."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < len(scores):
+        idx = np.argpartition(-scores, k - 1)[:k]
+    else:
+        idx = np.arange(len(scores))
+    return idx[np.argsort(-scores[idx], kind='stable')]
+
+
+def top_k(query, matrix, k, exclude_mask=None):
+    """
+    Los k vecinos más cercanos de ``query`` dentro de ``matrix``.
+
+    ``matrix`` debe venir normalizada por filas. ``exclude_mask`` es un arreglo
+    booleano (una posición por fila) con las filas que no pueden aparecer.
+    Devuelve (índices de fila, similitudes) ordenados de mayor a menor.
+    """
+    if not len(matrix):
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    scores = matrix @ normalize(query)
+    if exclude_mask is not None:
+        scores = np.where(exclude_mask, -np.inf, scores)
+    idx = _select_top(scores, k)
+    idx = idx[np.isfinite(scores[idx])]
+    return idx, scores[idx]
+
+
+def top_k_batch(queries, matrix, k, exclude_mask=None, block_size=4096):
+    """
+    Top-k para varias consultas a la vez con productos matriz-matriz.
+
+    Recorre ``matrix`` por bloques de filas para acotar la memoria y combina
+    los mejores de cada bloque. ``exclude_mask`` puede ser 1D (mismas filas
+    excluidas para todas las consultas) o 2D (n_consultas x n_filas).
+    Devuelve dos matrices (n_consultas x k): índices y similitudes; si hay
+    menos de k candidatos válidos, las posiciones sobrantes valen -1 / -inf.
+    """
+    queries = normalize(np.atleast_2d(queries))
+    n_queries, n_rows = len(queries), len(matrix)
+    k = min(k, n_rows)
+    best_idx = np.full((n_queries, k), -1, dtype=np.int64)
+    best_scores = np.full((n_queries, k), -np.inf, dtype=np.float32)
+    if k == 0:
+        return best_idx, best_scores
+
+    for start in range(0, n_rows, block_size):
+        stop = min(start + block_size, n_rows)
+        scores = queries @ np.asarray(matrix[start:stop]).T
+        if exclude_mask is not None:
+            mask = exclude_mask[..., start:stop]
+            scores = np.where(mask, -np.inf, scores)
+
+        # Unir los mejores acumulados con los candidatos del bloque
+        block_idx = np.broadcast_to(np.arange(start, stop), scores.shape)
+        all_scores = np.concatenate([best_scores, scores], axis=1)
+        all_idx = np.concatenate([best_idx, block_idx], axis=1)
+        part = np.argpartition(-all_scores, k - 1, axis=1)[:, :k]
+        best_scores = np.take_along_axis(all_scores, part, axis=1)
+        best_idx = np.take_along_axis(all_idx, part, axis=1)
+
+    order = np.argsort(-best_scores, axis=1, kind='stable')
+    best_scores = np.take_along_axis(best_scores, order, axis=1)
+    best_idx = np.take_along_axis(best_idx, order, axis=1)
+    best_idx[~np.isfinite(best_scores)] = -1
+    return best_idx, best_scores
+
+
+def top_k_quantized(query, quantized, matrix, k, exclude_mask=None, rerank_factor=4):
+    """
+    Top-k en dos fases: candidatos con la matriz cuantizada (``k * rerank_factor``)
+    y re-puntuación exacta de esos candidatos con la matriz float32.
+    """
+    if not len(quantized):
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    query = normalize(query)
+    approx = quantized.scores(query)
+    if exclude_mask is not None:
+        approx = np.where(exclude_mask, -np.inf, approx)
+    candidates = _select_top(approx, k * rerank_factor)
+    candidates = np.sort(candidates[np.isfinite(approx[candidates])])
+    exact = np.asarray(matrix[candidates]) @ query
+    idx = _select_top(exact, k)
+    return candidates[idx], exact[idx]
+
+
+def search_store(store, query, k, exclude_ids=None):
+    """
+    Busca en un ``EmbeddingStore`` y devuelve una lista de (book_id, similitud).
+    ``exclude_ids`` son ids de libros que no deben recomendarse (por ejemplo,
+    los que el usuario ya tiene).
+    """
+    if not len(store) or query is None:
+        return []
+    mask = store.mask_for(exclude_ids) if exclude_ids else None
+    if store.quantized is not None:
+        rerank_factor = getattr(settings, 'EMBEDDING_RERANK_FACTOR', 4)
+        rows, scores = top_k_quantized(query, store.quantized, store.matrix, k,
+                                       exclude_mask=mask, rerank_factor=rerank_factor)
+    else:
+        rows, scores = top_k(query, store.matrix, k, exclude_mask=mask)
+    return list(zip(store.ids[rows].tolist(), scores.tolist()))
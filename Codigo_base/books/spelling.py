@@ -0,0 +1,113 @@
+"""
+Corrección ortográfica de búsquedas ("¿quisiste decir...?").
+
+Vocabulario: las palabras (normalizadas con ``text.tokens``) de títulos y
+autores, con su frecuencia en el catálogo. Índice de borrado simétrico
+(SymSpell): para cada palabra se guardan las variantes que resultan de
+borrarle hasta 2 letras, así que una palabra mal escrita se corrige generando
+sus propios borrados y buscándolos en un diccionario, sin comparar contra
+todo el vocabulario. Solo se generan borrados sobre los primeros
+``PREFIX_LENGTH`` caracteres, como hace SymSpell, para acotar la memoria.
+
+El índice vive en memoria de cada proceso (``cache.ProcessLocal``, con
+``SPELLING_REBUILD_INTERVAL``).
+"""
+from collections import Counter
+
+from .cache import ProcessLocal
+from .models import Author, Book
+from .text import tokens
+
+MAX_DISTANCE = 2
+PREFIX_LENGTH = 7
+MIN_WORD_LENGTH = 3
+
+
+def _deletes(word, distance):
+    """Todas las variantes de ``word`` con hasta ``distance`` letras borradas."""
+    result = {word}
+    frontier = {word}
+    for _ in range(distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w)) if len(w) > 1}
+        result |= frontier
+    return result
+
+
+def damerau_levenshtein(a, b, limit):
+    """Distancia con transposiciones (OSA); devuelve ``limit + 1`` si la supera."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+class SpellingIndex:
+
+    def __init__(self, frequencies):
+        self.frequencies = frequencies
+        self.deletes = {}
+        for word in frequencies:
+            for variant in _deletes(word[:PREFIX_LENGTH], MAX_DISTANCE):
+                self.deletes.setdefault(variant, []).append(word)
+
+    @classmethod
+    def build(cls):
+        frequencies = Counter()
+        for title in Book.objects.values_list('title', flat=True).iterator(chunk_size=5000):
+            frequencies.update(w for w in tokens(title) if len(w) >= MIN_WORD_LENGTH)
+        for name in Author.objects.values_list('name', flat=True).iterator(chunk_size=5000):
+            frequencies.update(w for w in tokens(name) if len(w) >= MIN_WORD_LENGTH)
+        return cls(frequencies)
+
+    def correct_word(self, word):
+        """La palabra del vocabulario más cercana (y más frecuente), o ``None``."""
+        if word in self.frequencies or len(word) < MIN_WORD_LENGTH:
+            return word
+        candidates = set()
+        for variant in _deletes(word[:PREFIX_LENGTH], MAX_DISTANCE):
+            candidates.update(self.deletes.get(variant, ()))
+        best = None
+        for candidate in candidates:
+            distance = damerau_levenshtein(word, candidate, MAX_DISTANCE)
+            if distance > MAX_DISTANCE:
+                continue
+            key = (distance, -self.frequencies[candidate], candidate)
+            if best is None or key < best[0]:
+                best = (key, candidate)
+        return best[1] if best else None
+
+    def correct(self, query):
+        """
+        Consulta corregida palabra por palabra, o ``None`` si no hay nada que
+        corregir (o alguna palabra no tiene candidato).
+        """
+        words = tokens(query)
+        corrected = [self.correct_word(word) for word in words]
+        if not words or None in corrected or corrected == words:
+            return None
+        return ' '.join(corrected)
+
+
+# -------------------------------------------------------
+# Instancia compartida por proceso
+# -------------------------------------------------------
+_index = ProcessLocal(SpellingIndex.build, 'SPELLING_REBUILD_INTERVAL', 600)
+
+
+def get_spelling_index():
+    return _index.get()
+
+
+def suggest_correction(query):
+    return get_spelling_index().correct(query)
@@ -0,0 +1,51 @@
+"""
+Estadísticas del catálogo (libros por año y por género).
+
+Los conteos salen de agregaciones en la base de datos (``GROUP BY``) y se
+guardan en una fila de ``CatalogStats``. Los cambios en los libros la
+marcan como desactualizada (señales) y la siguiente visita a la página la
+recalcula; ``manage.py refresh_catalog_stats`` lo hace a mano (p. ej.
+después de una importación masiva, que no dispara señales).
+"""
+from django.db.models import Count
+
+from .models import Book, CatalogStats
+
+NO_YEAR = "Sin año"
+NO_GENRE = "Sin género"
+
+
+def count_by_year():
+    rows = Book.objects.values('publication_year').annotate(n=Count('id')).order_by('publication_year')
+    counts = [[str(row['publication_year']), row['n']] for row in rows if row['publication_year'] is not None]
+    missing = sum(row['n'] for row in rows if row['publication_year'] is None)
+    return counts + [[NO_YEAR, missing]] if missing else counts
+
+
+def count_by_genre():
+    counts = {}
+    for row in Book.objects.values('genre').annotate(n=Count('id')).order_by('genre'):
+        genre = row['genre'] or NO_GENRE
+        counts[genre] = counts.get(genre, 0) + row['n']
+    return sorted(counts.items())
+
+
+def refresh():
+    snapshot = CatalogStats.objects.first() or CatalogStats()
+    snapshot.by_year = count_by_year()
+    snapshot.by_genre = [list(pair) for pair in count_by_genre()]
+    snapshot.stale = False
+    snapshot.save()
+    return snapshot
+
+
+def get_snapshot():
+    """La foto vigente; se recalcula si no existe o quedó desactualizada."""
+    snapshot = CatalogStats.objects.first()
+    if snapshot is None or snapshot.stale:
+        snapshot = refresh()
+    return snapshot
+
+
+def mark_stale():
+    CatalogStats.objects.filter(stale=False).update(stale=True)
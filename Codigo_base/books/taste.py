@@ -0,0 +1,78 @@
+"""
+Vector de gustos por usuario.
+
+En vez de recargar todo el historial del usuario en cada página, se guarda en
+``UserTaste`` la suma de los embeddings de sus favoritos, libros comprados
+(un sumando por ``OrderItem``) y reseñados, junto con cuántos libros suman.
+Las señales de ``books/signals.py`` suman o restan un vector cada vez que se
+crea o borra uno de esos registros, y las recomendaciones parten del
+promedio ``vector_sum / count``.
+
+Si el almacén de embeddings se reconstruye, la suma se recalcula una vez desde
+el historial la próxima vez que se lea (``store_version`` deja de coincidir).
+"""
+import numpy as np
+from django.db import transaction
+
+from .embedding_store import get_embedding_store
+from .models import Favorite, OrderItem, Review, UserTaste
+
+
+def history_book_ids(user_id):
+    """Ids (con repetidos) de los libros que forman el gusto del usuario."""
+    return (
+        list(Favorite.objects.filter(user_id=user_id).values_list('book_id', flat=True))
+        + list(OrderItem.objects.filter(order__user_id=user_id).values_list('book_id', flat=True))
+        + list(Review.objects.filter(user_id=user_id).values_list('book_id', flat=True))
+    )
+
+
+def rebuild_taste(user_id, store=None):
+    """Recalcula desde cero la suma de embeddings del usuario y la guarda."""
+    store = store or get_embedding_store()
+    vectors = store.vectors_for(history_book_ids(user_id)) if len(store) else np.empty((0, 0))
+    if len(vectors):
+        vector_sum = vectors.astype(np.float64).sum(axis=0)
+    else:
+        vector_sum = np.zeros(store.dim, dtype=np.float64)
+    taste, _ = UserTaste.objects.update_or_create(
+        user_id=user_id,
+        defaults={'vector_sum': vector_sum.tobytes(), 'count': len(vectors),
+                  'store_version': store.version},
+    )
+    return taste
+
+
+def apply_taste_event(user_id, book_id, sign):
+    """
+    Suma (``sign=1``) o resta (``sign=-1``) el embedding de un libro al gusto
+    del usuario. Si el usuario aún no tiene fila, o quedó desactualizada, no
+    se toca: se reconstruirá completa en la siguiente lectura.
+    """
+    store = get_embedding_store()
+    vector = store.vector(book_id)
+    if vector is None:
+        return
+    with transaction.atomic():
+        taste = UserTaste.objects.select_for_update().filter(user_id=user_id).first()
+        if taste is None or taste.store_version != store.version:
+            return
+        vector_sum = np.frombuffer(bytes(taste.vector_sum), dtype=np.float64)
+        if len(vector_sum) != len(vector):
+            return
+        taste.vector_sum = (vector_sum + sign * vector.astype(np.float64)).tobytes()
+        taste.count = max(0, taste.count + sign)
+        taste.save(update_fields=['vector_sum', 'count', 'updated_at'])
+
+
+def get_taste_vector(user):
+    """Promedio de embeddings del historial del usuario, o ``None`` si no hay."""
+    store = get_embedding_store()
+    if not len(store):
+        return None
+    taste = UserTaste.objects.filter(user=user).first()
+    if taste is None or taste.store_version != store.version:
+        taste = rebuild_taste(user.id, store)
+    if not taste.count:
+        return None
+    return np.frombuffer(bytes(taste.vector_sum), dtype=np.float64) / taste.count
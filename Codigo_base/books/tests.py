@@ -1,3 +1,640 @@
-from django.test import TestCase
+import base64
+import json
+import re
+import shutil
+import tempfile
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import numpy as np
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import Count
+from django.http import QueryDict
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from . import embedding_store, search_index, spelling, typeahead
+from .cache import NAMESPACES, get_version
+from .ann_index import IVFIndex
+from .embedding_providers import get_embedding_provider
+from .embedding_store import EmbeddingStore
+from .facets import facet_counts
+from .filters import apply_filters, parse_filters
+from .models import Book, Favorite, Order, OrderItem, PromptEmbedding, Review, UserTaste
+from .pagination import SORT_FIELDS, decode_cursor, encode_cursor, keyset_page, keyset_queryset, sort_ordering
+from .prompt_cache import PromptEmbeddingCache, cache_key
+from .ranking import top_books
+from .result_cache import cached_results
+from .signals import bulk_loading
+from .similarity import normalize, top_k
+from .taste import rebuild_taste
+
+
+# Combinaciones de filtros que puede generar el panel del catálogo
+FILTER_SETS = {
+    'sin filtros': '',
+    'búsqueda': 'q=cien+años',
+    'un género': 'genre=Misterio',
+    'varios géneros': 'genre=Misterio&genre=Romance',
+    'autor': 'author=Agatha+Christie',
+    'precio': 'price_range=30000-50000',
+    'calificación': 'rating=4',
+    'año': 'year=2000-2009',
+    'género + precio': 'genre=Misterio&price_range=30000-50000',
+    'género + calificación': 'genre=Misterio&rating=4',
+    'género + año': 'genre=Misterio&year=2000-2009',
+    'todos': 'q=agatha&genre=Misterio&author=Agatha+Christie&price_range=30000-50000&rating=4&year=2000-2009',
+}
+
+
+@skipUnless(connection.vendor == 'sqlite', "Los planes se comprueban con EXPLAIN QUERY PLAN de SQLite")
+class CatalogQueryPlanTests(TestCase):
+    """
+    Ninguna consulta del catálogo puede recorrer la tabla completa y además
+    ordenar el resultado en un B-tree temporal: el orden debe salir de un
+    índice, o el filtro debe usar uno y ordenar solo lo que encontró.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.book = Book.objects.create(
+            title='Diez negritos', authors='Agatha Christie', genre='Misterio',
+            precio=45000, average_rating=4.2, publication_date='2005',
+        )
+
+    def plan(self, queryset):
+        return queryset.explain().splitlines()
+
+    def assertIndexedPlan(self, queryset, label):
+        plan = self.plan(queryset)
+        full_scan = any(re.search(r'\bSCAN \w+\s*$', line) for line in plan)
+        temp_sort = any('USE TEMP B-TREE FOR ORDER BY' in line for line in plan)
+        self.assertFalse(full_scan and temp_sort, f"{label}: recorrido completo + ordenamiento temporal\n" + '\n'.join(plan))
+
+    def test_catalog_pages(self):
+        for name, params in FILTER_SETS.items():
+            filters = parse_filters(QueryDict(params))
+            for sort_by in SORT_FIELDS:
+                qs = apply_filters(Book.objects.all(), filters).order_by(*sort_ordering(sort_by))
+                with self.subTest(filters=name, sort_by=sort_by):
+                    # Página por número y lista de ids de la caché de resultados
+                    self.assertIndexedPlan(qs[:20], f"{name} / {sort_by} / página")
+                    self.assertIndexedPlan(qs.values_list('id', flat=True)[:5001], f"{name} / {sort_by} / ids")
+
+    def test_catalog_cursor_pages(self):
+        for name, params in FILTER_SETS.items():
+            filters = parse_filters(QueryDict(params))
+            for sort_by in SORT_FIELDS:
+                for direction in ('next', 'prev'):
+                    position = decode_cursor(encode_cursor(sort_by, self.book, direction), sort_by)
+                    qs = keyset_queryset(apply_filters(Book.objects.all(), filters), sort_by, position)
+                    with self.subTest(filters=name, sort_by=sort_by, direction=direction):
+                        self.assertIndexedPlan(qs[:21], f"{name} / {sort_by} / cursor {direction}")
+
+    def test_top_rated(self):
+        # Top 100, "mejor valorados" de la portada y del catálogo
+        qs = Book.objects.filter(average_rating__isnull=False).order_by('-average_rating')
+        self.assertIndexedPlan(qs[:100], "top rated")
+        self.assertTrue(any('book_rating_idx' in line for line in self.plan(qs[:100])))
+
+    def test_top_ranking(self):
+        # Top 100 y "mejor valorados" por calificación ponderada
+        plan = self.plan(top_books(100))
+        self.assertFalse(any('USE TEMP B-TREE' in line for line in plan), '\n'.join(plan))
+        self.assertTrue(any('ranking_score_idx' in line for line in plan), '\n'.join(plan))
+
+    def test_new_books(self):
+        self.assertIndexedPlan(Book.objects.order_by('-id')[:8], "nuevos")
+
+    def test_genre_facet(self):
+        qs = Book.objects.exclude(genre='').values_list('genre', flat=True).distinct().order_by('genre')
+        self.assertIndexedPlan(qs, "géneros")
+
+    def test_statistics_counts(self):
+        # Los conteos de la página de estadísticas se leen solo de índices
+        for qs in (
+            Book.objects.values('publication_year').annotate(n=Count('id')).order_by('publication_year'),
+            Book.objects.values('genre').annotate(n=Count('id')).order_by('genre'),
+        ):
+            plan = self.plan(qs)
+            self.assertTrue(all('COVERING INDEX' in line for line in plan if 'SCAN' in line), '\n'.join(plan))
+
+
+class KeysetPaginationTests(TestCase):
+    """Recorrer el catálogo por cursor da exactamente el orden completo, en ambos sentidos."""
+
+    PER_PAGE = 4
+
+    @classmethod
+    def setUpTestData(cls):
+        # Valores repetidos (desempata el id) y nulos en precio, calificación y año
+        for i in range(23):
+            Book.objects.create(
+                title=f'Libro {i % 7}', authors='Autor', genre='Misterio',
+                precio=None if i % 5 == 0 else 10000 + (i % 4) * 5000,
+                average_rating=None if i % 6 == 0 else round(3 + (i % 3) * 0.5, 1),
+                publication_date='' if i % 4 == 0 else str(1990 + i % 5),
+            )
+
+    def walk(self, sort_by, cursor=None, direction='next'):
+        """Páginas (listas de ids) siguiendo los cursores desde ``cursor``."""
+        pages = []
+        while True:
+            page = keyset_page(Book.objects.all(), sort_by, cursor, self.PER_PAGE)
+            pages.append([book.id for book in page])
+            cursor = page.next_cursor if direction == 'next' else page.previous_cursor
+            if cursor is None:
+                return pages, page
+
+    def test_forward_and_backward_match_full_order(self):
+        for sort_by in SORT_FIELDS:
+            expected = list(Book.objects.order_by(*sort_ordering(sort_by)).values_list('id', flat=True))
+            with self.subTest(sort_by=sort_by):
+                forward, last = self.walk(sort_by)
+                self.assertEqual(sum(forward, []), expected)
+                self.assertFalse(last.has_next)
+
+                # Desde la última página hacia atrás se obtienen las mismas páginas
+                backward, first = self.walk(sort_by, last.previous_cursor, 'prev')
+                self.assertEqual(backward[::-1], forward[:-1])
+                self.assertFalse(first.has_previous)
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        first = [book.id for book in keyset_page(Book.objects.all(), 'price_low', None, self.PER_PAGE)]
+        book = Book.objects.first()
+
+        def token(data):
+            return base64.urlsafe_b64encode(json.dumps(data).encode()).decode()
+
+        for cursor in (
+            'no-es-un-cursor',
+            encode_cursor('title_az', book, 'next'),  # de otro orden
+            token({'s': 'price_low', 'v': {'x': 1}, 'i': book.id, 'd': 'next'}),
+            token({'s': 'price_low', 'v': 1, 'i': 'x', 'd': 'next'}),
+            token({'s': 'price_low', 'v': 1, 'i': book.id, 'd': 'arriba'}),
+        ):
+            with self.subTest(cursor=cursor):
+                page = keyset_page(Book.objects.all(), 'price_low', cursor, self.PER_PAGE)
+                self.assertEqual([b.id for b in page], first)
+                self.assertFalse(page.has_previous)
+
+        # Un texto como valor en los órdenes numéricos
+        for sort_by, (field, _) in SORT_FIELDS.items():
+            if field == 'title':
+                continue
+            cursor = token({'s': sort_by, 'v': 'abc', 'i': book.id, 'd': 'next'})
+            with self.subTest(sort_by=sort_by, value='abc'):
+                self.assertIsNone(decode_cursor(cursor, sort_by))
+                response = self.client.get(reverse('book_list'), {'sort_by': sort_by, 'cursor': cursor})
+                self.assertEqual(response.status_code, 200)
+                self.assertFalse(response.context['page_obj'].has_previous)
+
+        response = self.client.get(reverse('book_list'), {'sort_by': 'price_low', 'cursor': 'no-es-un-cursor'})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.context['page_obj'].has_previous)
+        self.assertEqual([b.id for b in response.context['page_obj'].object_list][:self.PER_PAGE], first)
+
+
+class IVFIndexTests(SimpleTestCase):
+    """El índice aproximado debe devolver casi los mismos vecinos que la búsqueda exacta."""
+
+    K = 10
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        rng = np.random.default_rng(0)
+        # Vectores agrupados alrededor de 50 centros, como los de un catálogo real
+        centers = rng.normal(size=(50, 16))
+        matrix = normalize(centers[rng.integers(0, 50, 3000)] + 0.3 * rng.normal(size=(3000, 16)))
+        cls.store = EmbeddingStore(np.arange(1, 3001, dtype=np.int64), matrix)
+        cls.index = IVFIndex.build(cls.store, n_lists=40)
+        cls.queries = normalize(centers[rng.integers(0, 50, 30)] + 0.3 * rng.normal(size=(30, 16)))
+
+    def exact(self, query, exclude_ids=()):
+        mask = self.store.mask_for(exclude_ids) if exclude_ids else None
+        rows, _ = top_k(query, self.store.matrix, self.K, exclude_mask=mask)
+        return self.store.ids[rows].tolist()
+
+    def found(self, query, nprobe, exclude_ids=None):
+        return [book_id for book_id, _ in self.index.search(self.store, query, self.K, nprobe, exclude_ids)]
+
+    def test_recall_against_exact_top_k(self):
+        hits = sum(len(set(self.found(query, 8)) & set(self.exact(query))) for query in self.queries)
+        self.assertGreaterEqual(hits / (self.K * len(self.queries)), 0.9)
+
+    def test_all_lists_is_exact(self):
+        for query in self.queries[:5]:
+            self.assertEqual(self.found(query, self.index.n_lists), self.exact(query))
+
+    def test_probes_more_lists_when_excluded_leave_too_few(self):
+        query = self.queries[0]
+        # Se excluye todo lo que hay en la lista más cercana
+        excluded = set(self.index.candidates(query, 1).tolist())
+        found = self.found(query, 1, excluded)
+        self.assertEqual(len(found), self.K)
+        self.assertFalse(excluded & set(found))
+
+
+class CacheVersionTests(TestCase):
+    """Cada cambio sube la versión de su espacio de nombres, y solo esa."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='lector', password='x')
+        self.book = Book.objects.create(title='Libro', authors='Autor')
+
+    def assertBumps(self, namespaces, action):
+        before = {namespace: get_version(namespace) for namespace in NAMESPACES}
+        action()
+        bumped = {namespace for namespace in NAMESPACES if get_version(namespace) != before[namespace]}
+        self.assertEqual(bumped, set(namespaces))
+
+    def test_book_changes(self):
+        self.assertBumps({'catalog'}, lambda: Book.objects.create(title='Otro', authors='Autor'))
+        self.book.title = 'Nuevo título'
+        self.assertBumps({'catalog'}, self.book.save)
+        self.assertBumps({'catalog'}, lambda: Book.objects.get(title='Otro').delete())
+
+    def test_rating_only_save_does_not_bump_catalog(self):
+        self.book.average_rating, self.book.ratings_count = 4.0, 1
+        self.assertBumps({'ratings'}, lambda: self.book.save(update_fields=['average_rating', 'ratings_count']))
+
+    def test_review_favorite_and_order(self):
+        self.client.force_login(self.user)
+        # La reseña guarda solo la calificación del libro: el catálogo no cambia
+        self.assertBumps({'reviews', 'ratings'}, lambda: self.client.post(
+            reverse('add_review', args=[self.book.id]), {'rating': 5, 'comment': 'Muy bueno'}))
+        self.assertBumps({'favorites'}, lambda: Favorite.objects.create(user=self.user, book=self.book))
+        order = Order.objects.create(user=self.user, total_price=1)
+        self.assertBumps({'orders'}, lambda: OrderItem.objects.create(order=order, book=self.book, price=1))
+
+    def test_bulk_loading_bumps_nothing(self):
+        with bulk_loading():
+            self.assertBumps(set(), lambda: Book.objects.create(title='Importado', authors='Autor'))
+
+
+class FacetCountTests(TestCase):
+    """Conteos por faceta: correctos, cacheados y recalculados al cambiar el catálogo."""
+
+    def setUp(self):
+        cache.clear()
+        self.misterio = Book.objects.create(title='Diez negritos', authors='Agatha Christie', genre='Misterio',
+                                            precio=45000, average_rating=4.2, publication_date='2005')
+        Book.objects.create(title='Asesinato en el Orient Express', authors='Agatha Christie', genre='Misterio',
+                            precio=20000, average_rating=3.1, publication_date='1995')
+        Book.objects.create(title='Orgullo y prejuicio', authors='Jane Austen', genre='Romance',
+                            precio=45000, average_rating=4.8, publication_date='2001')
+
+    def counts(self, params=''):
+        facets = facet_counts(parse_filters(QueryDict(params)))
+        return {name: {option['value']: option['count'] for option in options} for name, options in facets.items()}
+
+    def test_each_facet_ignores_its_own_filter(self):
+        counts = self.counts('genre=Misterio&price_range=30000-50000')
+        # Géneros: solo con el filtro de precio
+        self.assertEqual(counts['genre'], {'Misterio': 1, 'Romance': 1})
+        # Precios: solo con el filtro de género
+        self.assertEqual(counts['price_range']['0-30000'], 1)
+        self.assertEqual(counts['price_range']['30000-50000'], 1)
+        self.assertEqual(counts['author'], {'Agatha Christie': 1})
+        self.assertEqual(counts['rating']['4'], 1)
+        self.assertEqual(counts['year']['2000-2009'], 1)
+
+    def test_cached_until_catalog_changes(self):
+        self.assertEqual(self.counts()['genre'], {'Misterio': 2, 'Romance': 1})
+        with self.assertNumQueries(0):
+            self.counts()
+
+        Book.objects.create(title='Emma', authors='Jane Austen', genre='Romance', precio=90000)
+        counts = self.counts()
+        self.assertEqual(counts['genre'], {'Misterio': 2, 'Romance': 2})
+        self.assertEqual(counts['price_range']['80000-999999'], 1)
+
+        self.misterio.delete()
+        self.assertEqual(self.counts()['genre'], {'Misterio': 1, 'Romance': 2})
+
+    def test_rating_facet_follows_rating_changes(self):
+        self.assertEqual(self.counts()['rating']['4'], 2)
+        self.misterio.average_rating = 2.0
+        self.misterio.save(update_fields=['average_rating'])
+        self.assertEqual(self.counts()['rating']['4'], 1)
+        self.assertEqual(self.counts('rating=4')['genre'], {'Romance': 1})
+
+
+class ResultCacheTests(TestCase):
+    """La lista de ids de una consulta se reutiliza hasta que cambia el catálogo."""
+
+    def setUp(self):
+        cache.clear()
+        self.books = [Book.objects.create(title=f'Libro {i}', authors='Autor', genre='Misterio') for i in range(3)]
+
+    def results(self):
+        queryset = Book.objects.filter(genre='Misterio').order_by('id')
+        return cached_results(queryset, 'genre=Misterio', 'id')
+
+    def test_reused_until_catalog_changes(self):
+        self.assertEqual(self.results().ids, [b.id for b in self.books])
+        # Misma firma: ni filtrado ni conteo
+        with self.assertNumQueries(0):
+            self.assertEqual(len(self.results()), 3)
+
+        # Guardar un libro sube la versión del catálogo
+        new = Book.objects.create(title='Nuevo', authors='Autor', genre='Misterio')
+        self.assertEqual(self.results().ids, [b.id for b in self.books] + [new.id])
+
+        self.books[0].delete()
+        self.assertEqual(self.results().ids, [b.id for b in self.books[1:]] + [new.id])
+
+
+class TypeaheadTests(TestCase):
+    """Prefijos de títulos y autores, orden por popularidad y cambios libro a libro."""
+
+    def setUp(self):
+        cache.clear()
+        self.cien = Book.objects.create(title='Cien años de soledad', authors='Gabriel García Márquez',
+                                        ratings_count=1000, average_rating=4.5)
+        self.otono = Book.objects.create(title='El otoño del patriarca', authors='Gabriel García Márquez',
+                                         ratings_count=500, average_rating=4.0)
+        self.soledades = Book.objects.create(title='Soledades', authors='Luis de Góngora',
+                                             ratings_count=10, average_rating=4.8)
+        self.compania = Book.objects.create(title='Soledad y compañía', authors='Otro Autor',
+                                            ratings_count=10, average_rating=3.0)
+        self.index = typeahead.TypeaheadIndex.build()
+
+    def labels(self, query, limit=8):
+        return [s.get('title') or s.get('name') for s in self.index.suggest(query, limit)]
+
+    def test_prefix_on_full_title_and_mid_title_word(self):
+        self.assertEqual(self.labels('cien a'), ['Cien años de soledad'])
+        self.assertEqual(self.labels('patri'), ['El otoño del patriarca'])
+        # Tildes y mayúsculas no importan
+        self.assertEqual(self.labels('OTONO'), ['El otoño del patriarca'])
+
+    def test_ranked_by_ratings_count_then_average(self):
+        self.assertEqual(self.labels('soled'), ['Cien años de soledad', 'Soledades', 'Soledad y compañía'])
+        self.assertEqual(self.labels('soled', limit=2), ['Cien años de soledad', 'Soledades'])
+
+    def test_each_book_suggested_once(self):
+        # "Soledad de la soledad" entra con dos claves que empiezan por "soledad"
+        Book.objects.create(title='Soledad de la soledad', authors='Otro Autor', ratings_count=2000)
+        self.index = typeahead.TypeaheadIndex.build()
+        suggestions = self.index.suggest('soledad', 8)
+        ids = [(s['type'], s['id']) for s in suggestions]
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(len(suggestions), 4)
+        self.assertEqual(suggestions[0]['title'], 'Soledad de la soledad')
+        # Las dos mejores claves son del mismo libro: se piden más hasta completar
+        self.assertEqual(self.labels('soledad', limit=2), ['Soledad de la soledad', 'Cien años de soledad'])
+
+    def test_authors_by_name_and_surname(self):
+        for query in ('gabriel', 'gar', 'marquez'):
+            with self.subTest(query=query):
+                suggestions = self.index.suggest(query, 8)
+                self.assertEqual([(s['type'], s['name'], s['books']) for s in suggestions],
+                                 [('author', 'Gabriel García Márquez', 2)])
+
+    def test_incremental_updates(self):
+        book = Book.objects.create(title='Cien sonetos de amor', authors='Pablo Neruda', ratings_count=5000)
+        self.index.update_book(book)
+        self.assertEqual(self.labels('cien'), ['Cien sonetos de amor', 'Cien años de soledad'])
+        self.assertEqual(self.labels('neruda'), ['Pablo Neruda'])
+
+        # Cambiar el autor: el anterior se queda sin libros y deja de sugerirse
+        book.authors = 'Gabriel García Márquez'
+        book.save()
+        self.index.update_book(book)
+        self.assertEqual(self.labels('neruda'), [])
+        self.assertEqual(self.index.suggest('garcia', 8)[0]['books'], 3)
+
+        book_id = book.id
+        book.delete()
+        self.index.remove_book(book_id)
+        self.assertEqual(self.labels('cien'), ['Cien años de soledad'])
+        self.assertEqual(self.index.suggest('garcia', 8)[0]['books'], 2)
+
+    def test_endpoint(self):
+        with mock.patch.object(typeahead._index, 'value', None):
+            response = self.client.get(reverse('book_typeahead'), {'q': 'soled', 'limit': 2})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([s['title'] for s in data['suggestions']], ['Cien años de soledad', 'Soledades'])
+        self.assertEqual(data['suggestions'][0]['url'], reverse('book_detail', args=[self.cien.id]))
+
+
+class SearchPaginationTests(TestCase):
+    """Con más coincidencias que SEARCH_MAX_IDS, el total y las últimas páginas siguen siendo reales."""
+
+    def setUp(self):
+        if not search_index.is_available():
+            self.skipTest("Sin índice de texto completo")
+
+    def test_pages_beyond_max_ids(self):
+        books = [Book.objects.create(title=f'Misterio {i}', authors='Autor') for i in range(13)]
+        seen = []
+        with self.settings(SEARCH_MAX_IDS=5):
+            for page in (1, 2, 3):
+                response = self.client.get(reverse('book_search'), {'q': 'misterio', 'page': page})
+                self.assertEqual(response.context['paginator'].count, 13)
+                seen += [book.id for book in response.context['books']]
+        self.assertEqual(sorted(seen), [book.id for book in books])
+
+
+class SpellingTests(TestCase):
+    """La búsqueda sin resultados se corrige con el vocabulario del catálogo."""
+
+    def setUp(self):
+        cache.clear()
+        self.book = Book.objects.create(title='Cien años de soledad', authors='Gabriel García Márquez')
+        Book.objects.create(title='El amor en los tiempos del cólera', authors='Gabriel García Márquez')
+        patcher = mock.patch.object(spelling._index, 'value', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def search(self, query):
+        response = self.client.get(reverse('book_search'), {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return response.context
+
+    def test_misspelled_query_is_corrected(self):
+        context = self.search('soledda')
+        self.assertEqual(context['corrected_query'], 'soledad')
+        self.assertEqual([book.id for book in context['books']], [self.book.id])
+
+    def test_exact_match_is_not_corrected(self):
+        context = self.search('soledad')
+        self.assertIsNone(context['corrected_query'])
+        self.assertIsNone(context['suggested_query'])
+        self.assertEqual([book.id for book in context['books']], [self.book.id])
+
+
+class PromptEmbeddingCacheTests(TestCase):
+    """Memoria del proceso, luego la tabla y solo al final el proveedor."""
+
+    def setUp(self):
+        self.calls = []
+
+    def compute(self, text):
+        self.calls.append(text)
+        return [float(len(self.calls)), 0.0]
+
+    def test_memory_then_db_then_provider(self):
+        prompt_cache = PromptEmbeddingCache()
+        first = prompt_cache.get('Novela  de Misterio', 'modelo', self.compute)
+        self.assertEqual(self.calls, ['Novela  de Misterio'])
+
+        with self.assertNumQueries(0):
+            again = prompt_cache.get('novela de misterio', 'modelo', self.compute)
+        np.testing.assert_array_equal(again, first)
+
+        # Otro proceso (memoria vacía) la lee de la tabla
+        other = PromptEmbeddingCache()
+        np.testing.assert_array_equal(other.get('novela de misterio', 'modelo', self.compute), first)
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(other.stats, {'memory_hits': 0, 'db_hits': 1, 'misses': 0})
+        self.assertEqual(PromptEmbedding.objects.get().hits, 1)
+
+        # Otro modelo es otra entrada
+        other.get('novela de misterio', 'otro-modelo', self.compute)
+        self.assertEqual(len(self.calls), 2)
+
+    def test_memory_lru(self):
+        prompt_cache = PromptEmbeddingCache(memory_size=2)
+        for prompt in ('a', 'b', 'a', 'c'):
+            prompt_cache.get(prompt, 'modelo', self.compute)
+        self.assertEqual(list(prompt_cache._memory), [cache_key('a', 'modelo'), cache_key('c', 'modelo')])
+
+    def test_db_evicted_every_n_inserts(self):
+        prompt_cache = PromptEmbeddingCache(db_size=2, evict_every=3)
+
+        def insert(*prompts):
+            with CaptureQueriesContext(connection) as queries:
+                for prompt in prompts:
+                    prompt_cache.get(prompt, 'modelo', self.compute)
+            return sum('COUNT(' in query['sql'] for query in queries)
+
+        # Sin conteo ni recorte hasta la tercera inserción
+        self.assertEqual(insert('a', 'b'), 0)
+        self.assertEqual(insert('c'), 1)
+        self.assertEqual(sorted(PromptEmbedding.objects.values_list('prompt', flat=True)), ['b', 'c'])
+
+        self.assertEqual(insert('d', 'e'), 0)
+        self.assertEqual(PromptEmbedding.objects.count(), 4)
+        self.assertEqual(insert('f'), 1)
+        self.assertEqual(sorted(PromptEmbedding.objects.values_list('prompt', flat=True)), ['e', 'f'])
+
+
+class MigrationBackfillTests(TransactionTestCase):
+    """Las migraciones de datos llenan lo que agregan a partir de libros ya existentes."""
+
+    START = '0026_book_embedding_model'
+
+    def setUp(self):
+        self.addCleanup(self.migrate, None)
+        self.addCleanup(search_index._available.clear)
+        apps = self.migrate(self.START)
+        Book = apps.get_model('books', 'Book')
+        self.book_id = Book.objects.create(
+            title='Cien Años de Soledad', authors='Gabriel García Márquez / Gabriel Garcia Marquez',
+            genre='Realismo Mágico', publisher='Sudamericana', publication_date='1967-05-30',
+        ).id
+
+    def migrate(self, target):
+        """Lleva la base a ``target`` (o a la última migración) y devuelve sus modelos históricos."""
+        executor = MigrationExecutor(connection)
+        targets = [('books', target)] if target else executor.loader.graph.leaf_nodes('books')
+        executor.migrate(targets)
+        search_index._available.clear()
+        return executor.loader.project_state(targets).apps
+
+    def test_search_index(self):
+        self.migrate('0027_book_search_index')
+        if not search_index.is_available():
+            self.skipTest("Sin índice de texto completo")
+        self.assertEqual(search_index.search_ids('soledad garcia'), [self.book_id])
+        self.assertEqual(search_index.search_ids('magico'), [self.book_id])
+
+    def test_normalized_fields(self):
+        Book = self.migrate('0028_book_normalized_fields').get_model('books', 'Book')
+        book = Book.objects.get(id=self.book_id)
+        self.assertEqual(
+            (book.title_norm, book.authors_norm, book.publisher_norm, book.genre_norm),
+            ('cien anos de soledad', 'gabriel garcia marquez / gabriel garcia marquez', 'sudamericana',
+             'realismo magico'),
+        )
+
+    def test_authors_split(self):
+        apps = self.migrate('0026_book_embedding_model')
+        apps.get_model('books', 'Book').objects.create(title='Crónica', authors='Gabriel García Márquez')
+        apps = self.migrate('0029_author')
+        Author = apps.get_model('books', 'Author')
+        # "A / A" sin tildes es el mismo autor; cada libro queda enlazado a él
+        author = Author.objects.get()
+        self.assertEqual((author.name, author.name_norm), ('Gabriel García Márquez', 'gabriel garcia marquez'))
+        self.assertEqual(author.books.count(), 2)
+
+    def test_publication_year(self):
+        apps = self.migrate('0026_book_embedding_model')
+        Book = apps.get_model('books', 'Book')
+        unknown = Book.objects.create(title='Sin año', authors='Autor', publication_date='0').id
+        Book = self.migrate('0030_book_publication_year').get_model('books', 'Book')
+        self.assertEqual(Book.objects.get(id=self.book_id).publication_year, 1967)
+        self.assertIsNone(Book.objects.get(id=unknown).publication_year)
+
+
+class UserTasteTests(TestCase):
+    """Las sumas incrementales de las señales deben coincidir con ``rebuild_taste``."""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        overrides = self.settings(EMBEDDING_PROVIDER='local', EMBEDDING_QUANTIZATION=None,
+                                 EMBEDDING_STORE_DIR=directory)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.addCleanup(setattr, embedding_store, '_store', None)
+
+        model = get_embedding_provider().model
+        rng = np.random.default_rng(0)
+        self.books = [
+            Book.objects.create(title=f'Libro {i}', authors='Autor', genre='g',
+                                embeddings=rng.normal(size=8).tolist(), embedding_model=model)
+            for i in range(6)
+        ]
+        embedding_store.rebuild_embedding_store()
+        self.user = User.objects.create_user(username='lector', password='x')
+        rebuild_taste(self.user.id)
+
+    def assertMatchesRebuild(self):
+        taste = UserTaste.objects.get(user=self.user)
+        incremental = np.frombuffer(bytes(taste.vector_sum), dtype=np.float64).copy(), taste.count
+        rebuilt = rebuild_taste(self.user.id)
+        self.assertEqual(incremental[1], rebuilt.count)
+        np.testing.assert_allclose(incremental[0], np.frombuffer(bytes(rebuilt.vector_sum), dtype=np.float64),
+                                   atol=1e-9)
+
+    def test_incremental_updates_match_rebuild(self):
+        b = self.books
+        favorites = [Favorite.objects.create(user=self.user, book=book) for book in b[:3]]
+        reviews = [Review.objects.create(user=self.user, book=book, rating=4, comment='ok') for book in b[2:5]]
+        order = Order.objects.create(user=self.user, total_price=1)
+        items = [OrderItem.objects.create(order=order, book=book, price=1) for book in (b[0], b[0], b[5])]
+        self.assertMatchesRebuild()
+        self.assertEqual(UserTaste.objects.get(user=self.user).count, 9)
+
+        favorites[1].delete()
+        reviews[0].delete()
+        items[0].delete()
+        # Editar una reseña no cambia el historial
+        reviews[1].rating = 2
+        reviews[1].save()
+        self.assertMatchesRebuild()
+        self.assertEqual(UserTaste.objects.get(user=self.user).count, 6)
+
+        # Borrar el pedido borra sus ítems en cascada
+        order.delete()
+        self.assertMatchesRebuild()
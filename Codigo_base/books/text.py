@@ -0,0 +1,54 @@
+"""Utilidades de normalización de texto compartidas por búsqueda y embeddings."""
+import re
+import unicodedata
+
+from django.db.models import Q
+
+WORD_RE = re.compile(r'\w+')
+YEAR_RE = re.compile(r'\b(\d{4})\b')
+
+
+def fold(text):
+    """Minúsculas y sin tildes: "García Márquez" -> "garcia marquez"."""
+    if not text:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def tokens(text):
+    """Palabras normalizadas (sin tildes, en minúsculas) de un texto."""
+    return WORD_RE.findall(fold(text))
+
+
+def parse_year(value):
+    """Año (int) de un texto como "1998" o "1998-05-01"; None si no hay uno válido."""
+    match = YEAR_RE.search(str(value or ''))
+    if not match:
+        return None
+    year = int(match.group(1))
+    # El dataset usa 0 y años futuros como "desconocido"
+    return year if 1000 <= year <= 2100 else None
+
+
+def split_authors(authors):
+    """
+    Separa el texto "Autor A / Autor B" en nombres, sin repetidos (comparando
+    sin tildes ni mayúsculas) y en el orden original.
+    """
+    names = {}
+    for name in (authors or '').split('/'):
+        name = ' '.join(name.split())
+        if name:
+            names.setdefault(fold(name), name)
+    return list(names.values())
+
+
+def prefix_q(field, text):
+    """
+    Filtro "empieza por" sobre una columna ya normalizada. Se expresa como
+    rango (>= prefijo y < prefijo + U+FFFF) para que la base de datos use el
+    índice de la columna, cosa que no pasa con LIKE 'x%' en SQLite.
+    """
+    prefix = fold(text).strip()
+    return Q(**{f'{field}__gte': prefix, f'{field}__lt': prefix + '\uffff'})
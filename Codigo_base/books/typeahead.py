@@ -0,0 +1,212 @@
+"""
+Autocompletado de títulos y autores.
+
+Índice en memoria: un arreglo ordenado de claves normalizadas (``text.fold``)
+donde se busca el prefijo con ``bisect``. Cada título entra completo y desde
+cada palabra ("soledad" encuentra "Cien años de soledad"); cada autor, igual,
+por su nombre y desde cada apellido ("garcia" encuentra a "Gabriel García
+Márquez"). Las sugerencias se ordenan por ``ratings_count`` y después por
+``average_rating``.
+
+El índice vive en memoria de cada proceso (``cache.ProcessLocal``, con
+``TYPEAHEAD_REBUILD_INTERVAL``) y además se actualiza libro a libro con
+señales.
+"""
+import heapq
+import threading
+from bisect import bisect_left
+
+from django.db.models import Count, Max, Sum
+
+from .cache import ProcessLocal
+from .models import Author, Book
+from .text import fold
+
+MAX_SUFFIXES_PER_TITLE = 6
+MIN_WORD_LENGTH = 3
+# Prefijos que abarcan más claves que esto memorizan su resultado hasta el
+# siguiente cambio del índice
+MEMO_RANGE = 1000
+MEMO_SIZE = 4096
+
+
+def title_keys(title_norm):
+    """Claves de un título: completo y desde cada palabra significativa."""
+    keys = [title_norm] if title_norm else []
+    words = title_norm.split()
+    for i in range(1, len(words)):
+        if len(keys) > MAX_SUFFIXES_PER_TITLE:
+            break
+        if len(words[i]) >= MIN_WORD_LENGTH:
+            keys.append(' '.join(words[i:]))
+    return keys
+
+
+def author_keys(name_norm):
+    """Claves de un autor: nombre completo y desde cada palabra (apellidos)."""
+    return title_keys(name_norm)
+
+
+class TypeaheadIndex:
+
+    def __init__(self):
+        self.keys = []          # claves ordenadas
+        self.refs = []          # ('b', id) o ('a', id), paralelo a keys
+        self.scores = []        # puntaje de cada ref, paralelo a keys
+        self.entries = {}       # ref -> (puntaje, dict con los datos de la sugerencia)
+        self.ref_keys = {}      # ref -> claves insertadas (para poder quitarlas)
+        self.book_authors = {}  # id de libro -> ids de sus autores
+        self._memo = {}
+        self._lock = threading.Lock()
+
+    # ---------------------------------------------------
+    # Construcción y mantenimiento
+    # ---------------------------------------------------
+    @classmethod
+    def build(cls):
+        index = cls()
+        pairs = []
+        books = Book.objects.only('id', 'title', 'authors', 'title_norm', 'ratings_count', 'average_rating')
+        for book in books.iterator(chunk_size=5000):
+            ref = ('b', book.id)
+            index._set_entry(ref, book_entry(book), title_keys(book.title_norm))
+            pairs.extend((key, ref) for key in index.ref_keys[ref])
+        for book_id, author_id in Book.autores.through.objects.values_list('book_id', 'author_id').iterator():
+            index.book_authors.setdefault(book_id, []).append(author_id)
+        # Autores que se quedaron sin libros (cambió el texto o se borró el libro) no se sugieren
+        for author in authors_with_scores(Author.objects.all()).filter(n_books__gt=0):
+            ref = ('a', author.id)
+            index._set_entry(ref, author_entry(author), author_keys(author.name_norm))
+            pairs.extend((key, ref) for key in index.ref_keys[ref])
+        pairs.sort()
+        index.keys = [key for key, _ in pairs]
+        index.refs = [ref for _, ref in pairs]
+        index.scores = [index.entries[ref][0] for ref in index.refs]
+        return index
+
+    def _set_entry(self, ref, entry, keys):
+        self.entries[ref] = entry
+        self.ref_keys[ref] = keys
+
+    def _remove(self, ref):
+        for key in self.ref_keys.pop(ref, []):
+            i = bisect_left(self.keys, key)
+            while i < len(self.keys) and self.keys[i] == key:
+                if self.refs[i] == ref:
+                    del self.keys[i]
+                    del self.refs[i]
+                    del self.scores[i]
+                    break
+                i += 1
+        self.entries.pop(ref, None)
+
+    def _insert(self, ref, entry, keys):
+        self._set_entry(ref, entry, keys)
+        for key in keys:
+            i = bisect_left(self.keys, key)
+            self.keys.insert(i, key)
+            self.refs.insert(i, ref)
+            self.scores.insert(i, entry[0])
+
+    def update_book(self, book):
+        """
+        Vuelve a indexar un libro y a sus autores, actuales y anteriores, cuyo
+        puntaje depende de él.
+        """
+        with self._lock:
+            self._remove(('b', book.id))
+            self._insert(('b', book.id), book_entry(book), title_keys(book.title_norm))
+            author_ids = list(book.autores.values_list('id', flat=True))
+            previous = self.book_authors.get(book.id, [])
+            self.book_authors[book.id] = author_ids
+            self._refresh_authors(set(author_ids) | set(previous))
+            self._memo.clear()
+
+    def remove_book(self, book_id):
+        with self._lock:
+            self._remove(('b', book_id))
+            self._refresh_authors(self.book_authors.pop(book_id, []))
+            self._memo.clear()
+
+    def _refresh_authors(self, author_ids):
+        if not author_ids:
+            return
+        for author in authors_with_scores(Author.objects.filter(id__in=author_ids)):
+            self._remove(('a', author.id))
+            if author.n_books:
+                self._insert(('a', author.id), author_entry(author), author_keys(author.name_norm))
+
+    # ---------------------------------------------------
+    # Consulta
+    # ---------------------------------------------------
+    def suggest(self, query, limit=8):
+        prefix = ' '.join(fold(query).split())
+        if not prefix:
+            return []
+        with self._lock:
+            memo = self._memo.get(prefix)
+            if memo is not None and len(memo) >= limit:
+                return memo[:limit]
+            start = bisect_left(self.keys, prefix)
+            end = bisect_left(self.keys, prefix + '\uffff', lo=start)
+            result = self._top(start, end, limit)
+            if end - start > MEMO_RANGE:
+                if len(self._memo) >= MEMO_SIZE:
+                    self._memo.clear()
+                self._memo[prefix] = result
+            return result
+
+    def _top(self, start, end, limit):
+        """Las ``limit`` mejores refs distintas entre las posiciones start:end."""
+        picked = []
+        seen = set()
+        # Un libro puede aparecer con varias claves: se piden de más y se deduplica
+        want = limit
+        while True:
+            best = heapq.nlargest(want, range(start, end), key=self.scores.__getitem__)
+            for i in best:
+                ref = self.refs[i]
+                if ref not in seen:
+                    seen.add(ref)
+                    picked.append(ref)
+            if len(picked) >= limit or len(best) < want:
+                return [self.entries[ref][1] for ref in picked[:limit]]
+            picked, seen, want = [], set(), want * 2
+
+
+def book_entry(book):
+    score = (book.ratings_count or 0, book.average_rating or 0.0)
+    return score, {'type': 'book', 'id': book.id, 'title': book.title, 'authors': book.authors}
+
+
+def author_entry(author):
+    score = (author.total_ratings or 0, author.best_rating or 0.0)
+    return score, {'type': 'author', 'id': author.id, 'name': author.name, 'books': author.n_books}
+
+
+def authors_with_scores(authors):
+    """Autores con el número de libros y la popularidad sumada de sus libros."""
+    return authors.annotate(
+        n_books=Count('books'),
+        total_ratings=Sum('books__ratings_count'),
+        best_rating=Max('books__average_rating'),
+    )
+
+
+# -------------------------------------------------------
+# Instancia compartida por proceso
+# -------------------------------------------------------
+_index = ProcessLocal(TypeaheadIndex.build, 'TYPEAHEAD_REBUILD_INTERVAL', 60)
+
+
+def get_typeahead_index():
+    return _index.get()
+
+
+def loaded_index():
+    """El índice si ya se construyó en este proceso (las señales no lo crean)."""
+    return _index.loaded()
+
+
+def mark_current(index):
+    _index.mark_current(index)
@@ -5,7 +5,7 @@ from .views import (
     book_detail, add_to_cart, buy_now, cart_view,
     UserProfileView, edit_profile, my_orders, order_detail,
     my_favorites, toggle_favorite, user_statistics, user_settings,
-    create_order_from_cart, Top100BooksView,
+    create_order_from_cart, Top100BooksView, typeahead_view,
     checkout_view, payment_method_view, process_payment_view, payment_success_view
 )
 from .ia_api import ia_book_synopsis
@@ -17,6 +17,7 @@ urlpatterns = [
     path('about/', AboutPageView.as_view(), name='about'),
     path('catalogo/', BookListView.as_view(), name='book_list'),
     path('books/search/', BookSearchView.as_view(), name='book_search'),
+    path('books/typeahead/', typeahead_view, name='book_typeahead'),
     path('books/statistics/', statistics_view, name='book_statistics'),
     path('promociones/', promociones_view, name='promociones'),
     path('books/filter-options/', filter_options_ajax, name='books_filter_options'),
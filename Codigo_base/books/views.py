@@ -3,12 +3,14 @@ from django.views.decorators.http import require_GET
 from django.utils.decorators import method_decorator
 from django.shortcuts import render, redirect, get_object_or_404
 from django.views.generic import TemplateView, ListView
-from django.db.models import Q, Count
+from django.db.models import Count
 from django.contrib import messages
 from django.views.decorators.csrf import csrf_exempt
 from django.utils import timezone
-from openai import OpenAI
-import numpy as np
+from django.urls import reverse
+from django.conf import settings
+from django.core.cache import cache
+from urllib.parse import urlencode
 import os
 import io
 import base64
@@ -17,24 +19,35 @@ import matplotlib
 matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 from dotenv import load_dotenv
-from .models import Book
+from .models import Book, SimilarBook
+from .embedding_store import get_embedding_store
+from .embedding_providers import get_embedding_provider
+from .similarity import search_store
+from .ann_index import ann_search
+from .prompt_cache import prompt_embedding_cache
+from .taste import get_taste_vector, history_book_ids
+from .hybrid_search import hybrid_search
+from .pagination import DEFAULT_SORT, SORT_FIELDS, BooksById, KeysetPage, encode_cursor, keyset_page, sort_ordering
+from . import search_index
+from .filters import apply_filters, parse_filters, signature
+from .result_cache import cached_results
+from .typeahead import get_typeahead_index
+from .facets import facet_counts
+from .spelling import suggest_correction
+from .sampling import HEAVY_FIELDS, random_books
+from .cache import cached
+from .ranking import top_books
+from .stats import get_snapshot as get_stats_snapshot
 
 # -------------------------------------------------------
-# 🔧 CONFIGURACIÓN OPENAI
+# 🔧 CONFIGURACIÓN EMBEDDINGS (OpenAI o proveedor local)
 # -------------------------------------------------------
 load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env'))
 
-def get_openai_client():
-    """Inicializa el cliente de OpenAI usando la API Key del entorno."""
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise ValueError("❌ No se encontró la API key de OpenAI en las variables de entorno.")
-    return OpenAI(api_key=api_key)
 
-
-def cosine_similarity(a, b):
-    """Calcula la similitud de coseno entre dos vectores."""
-    return np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
+def embed_prompt(text):
+    """Embedding de un texto con el proveedor configurado en EMBEDDING_PROVIDER."""
+    return get_embedding_provider().embed([text])[0]
 
 
 # -------------------------------------------------------
@@ -42,30 +55,32 @@ def cosine_similarity(a, b):
 # -------------------------------------------------------
 @require_GET
 def filter_options_ajax(request):
-    genres = request.GET.getlist('genre')
-    authors = request.GET.getlist('author')
-    qs = Book.objects.all()
-
-    if genres:
-        qs = qs.filter(genre__in=genres)
-    if authors:
-        qs = qs.filter(
-            authors__regex=r'(' + '|'.join([a.replace('.', r'\.') for a in authors]) + ')'
-        )
-
-    valid_genres = list(qs.values_list('genre', flat=True)
-                        .exclude(genre='')
-                        .distinct()
-                        .order_by('genre'))
+    facets = facet_counts(parse_filters(request.GET))
+    return JsonResponse({
+        'genres': [option['value'] for option in facets['genre']],
+        'authors': [option['value'] for option in facets['author']],
+        'facets': facets,
+    })
 
-    autores_raw = qs.values_list('authors', flat=True).exclude(authors='').distinct()
-    autores_set = set()
-    for autores in autores_raw:
-        for autor in autores.split('/'):
-            autores_set.add(autor.strip())
-    valid_authors = sorted(autores_set)
 
-    return JsonResponse({'genres': valid_genres, 'authors': valid_authors})
+@require_GET
+def typeahead_view(request):
+    """Sugerencias de títulos y autores mientras se escribe."""
+    query = request.GET.get('q', '')
+    try:
+        limit = max(1, min(int(request.GET.get('limit', 8)), 20))
+    except ValueError:
+        limit = 8
+
+    suggestions = []
+    for suggestion in get_typeahead_index().suggest(query, limit):
+        suggestion = dict(suggestion)
+        if suggestion['type'] == 'book':
+            suggestion['url'] = reverse('book_detail', args=[suggestion['id']])
+        else:
+            suggestion['url'] = f"{reverse('book_list')}?{urlencode({'author': suggestion['name']})}"
+        suggestions.append(suggestion)
+    return JsonResponse({'query': query, 'suggestions': suggestions})
 
 
 # -------------------------------------------------------
@@ -76,14 +91,18 @@ class HomePageView(TemplateView):
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
-        
+        timeouts = getattr(settings, 'HOME_SECTION_TIMEOUTS', {})
+
+        # ⚡ Secciones iguales para todos los visitantes: cacheadas por separado
         # Top 4 mejor valorados
-        ctx['top_rated_books'] = Book.objects.filter(
-            average_rating__isnull=False
-        ).order_by('-average_rating')[:4]
-        
+        ctx['top_rated_books'] = cached(('catalog', 'ratings'), ('top_rated', 4), lambda: list(
+            top_books(4).defer(*HEAVY_FIELDS)
+        ), timeouts.get('top_rated'))
+
         # Últimos 8 agregados (novedades)
-        ctx['new_books'] = Book.objects.all().order_by('-id')[:8]
+        ctx['new_books'] = cached('catalog', ('home', 'new_books'), lambda: list(
+            Book.objects.defer(*HEAVY_FIELDS).order_by('-id')[:8]
+        ), timeouts.get('new_books'))
         
         # 🆕 RECOMENDACIONES PERSONALIZADAS (si el usuario está autenticado)
         if self.request.user.is_authenticated:
@@ -91,16 +110,17 @@ class HomePageView(TemplateView):
             ctx['personalized_books'] = recommended_books
         else:
             # Si no está autenticado, mostrar libros random
-            from random import sample
-            all_books = list(Book.objects.all())
-            ctx['personalized_books'] = sample(all_books, min(len(all_books), 8))
+            ctx['personalized_books'] = random_books(8)
         
         # 🆕 ÚLTIMAS RESEÑAS (5 más recientes)
-        ctx['latest_reviews'] = Review.objects.select_related('user', 'book').order_by('-created_at')[:5]
-        
+        ctx['latest_reviews'] = cached('reviews', ('home', 'latest_reviews'), lambda: list(
+            Review.objects.select_related('user', 'book')
+            .defer(*(f'book__{field}' for field in HEAVY_FIELDS)).order_by('-created_at')[:5]
+        ), timeouts.get('latest_reviews'))
+
         # Estadísticas
-        ctx['total_books'] = Book.objects.count()
-        ctx['total_reviews'] = Review.objects.count()
+        ctx['total_books'] = cached('catalog', ('home', 'total_books'), Book.objects.count, timeouts.get('counts'))
+        ctx['total_reviews'] = cached('reviews', ('home', 'total_reviews'), Review.objects.count, timeouts.get('counts'))
         
         return ctx
     
@@ -114,58 +134,19 @@ class HomePageView(TemplateView):
         recommended_books = []
         
         try:
-            # Obtener libros favoritos del usuario
-            favorite_books = Book.objects.filter(
-                id__in=Favorite.objects.filter(user=user).values_list('book_id', flat=True)
-            ).exclude(embeddings__isnull=True)
-            
-            # Obtener libros comprados
-            purchased_books = Book.objects.filter(
-                id__in=OrderItem.objects.filter(
-                    order__user=user
-                ).values_list('book_id', flat=True)
-            ).exclude(embeddings__isnull=True)
-            
-            # Obtener libros que ha reseñado
-            reviewed_books = Book.objects.filter(
-                id__in=Review.objects.filter(user=user).values_list('book_id', flat=True)
-            ).exclude(embeddings__isnull=True)
-            
-            # Combinar todos los libros base
-            base_books = list(favorite_books) + list(purchased_books) + list(reviewed_books)
-            
-            if base_books:
-                # Calcular promedio de embeddings de libros base
-                embeddings_list = []
-                for book in base_books:
-                    if book.embeddings:
-                        embeddings_list.append(np.array(book.embeddings, dtype=np.float32))
-                
-                if embeddings_list:
-                    # Promedio de embeddings
-                    avg_embedding = np.mean(embeddings_list, axis=0)
-                    
-                    # Buscar libros similares
-                    books_with_similarity = []
-                    
-                    # Excluir libros que ya tiene
-                    exclude_ids = [b.id for b in base_books]
-                    
-                    for candidate in Book.objects.exclude(id__in=exclude_ids).exclude(embeddings__isnull=True)[:200]:
-                        try:
-                            candidate_emb = np.array(candidate.embeddings, dtype=np.float32)
-                            similarity = cosine_similarity(avg_embedding, candidate_emb)
-                            books_with_similarity.append((candidate, similarity))
-                        except Exception:
-                            continue
-                    
-                    # Ordenar por similitud
-                    books_with_similarity.sort(key=lambda x: x[1], reverse=True)
-                    recommended_books = [b[0] for b in books_with_similarity[:8]]
-        
+            # Promedio de embeddings del historial (mantenido por señales)
+            taste = get_taste_vector(user)
+            if taste is not None:
+                # Buscar libros similares excluyendo los que ya tiene
+                owned_ids = history_book_ids(user.id)
+                top = search_store(get_embedding_store(), taste, 8, exclude_ids=owned_ids)
+                top_ids = [book_id for book_id, _ in top]
+                books_by_id = Book.objects.in_bulk(top_ids)
+                recommended_books = [books_by_id[i] for i in top_ids if i in books_by_id]
+
         except Exception as e:
             print(f"Error en recomendaciones personalizadas: {e}")
-        
+
         # Si no hay suficientes recomendaciones, completar con mejor valorados
         if len(recommended_books) < 8:
             additional = Book.objects.filter(
@@ -186,23 +167,18 @@ class AboutPageView(TemplateView):
 
 class BookListView(ListView):
     model = Book
-    template_name = "book_list.html"
+    template_name = "books/book_list.html"
     context_object_name = "books"
     paginate_by = 20
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
-        # Géneros
-        context['genres'] = Book.objects.values_list('genre', flat=True).exclude(genre='').distinct().order_by('genre')
-
-        # Autores
-        autores_raw = Book.objects.values_list('authors', flat=True).exclude(authors='').distinct()
-        autores_set = set()
-        for autores in autores_raw:
-            for autor in autores.split('/'):
-                autores_set.add(autor.strip())
-        context['authors'] = sorted(autores_set)
+        # Facetas con conteos (géneros, autores, precio, calificación, año)
+        facets = facet_counts(self.filters)
+        context['facets'] = facets
+        context['genres'] = facets['genre']
+        context['authors'] = facets['author']
 
         # Filtros seleccionados
         request = self.request
@@ -226,89 +202,51 @@ class BookListView(ListView):
         
         context['active_filters_count'] = active_filters
 
-        top_4_books = Book.objects.filter(
-            average_rating__isnull=False
-        ).order_by('-average_rating')[:4]
-
-        context['top_4_books'] = top_4_books
+        context['top_4_books'] = cached(('catalog', 'ratings'), ('top_rated', 4), lambda: list(
+            top_books(4).defer(*HEAVY_FIELDS)
+        ), getattr(settings, 'HOME_SECTION_TIMEOUTS', {}).get('top_rated'))
+
+        # Cursores para avanzar/retroceder desde la página actual
+        page = context['page_obj']
+        if isinstance(page, KeysetPage):
+            context['keyset'] = True
+            context['next_cursor'] = page.next_cursor
+            context['previous_cursor'] = page.previous_cursor
+        elif page is not None:
+            # list() llena la caché del queryset que después recorre la plantilla
+            books = list(page.object_list)
+            if page.has_next():
+                context['next_cursor'] = encode_cursor(self.sort_by, books[-1], 'next')
+            if page.has_previous():
+                context['previous_cursor'] = encode_cursor(self.sort_by, books[0], 'prev')
         
         return context
 
     def get_queryset(self):
         qs = super().get_queryset()
         request = self.request
-        
-        # 🔍 Búsqueda por texto
-        search = request.GET.get('q', '').strip()
-        if search:
-            qs = qs.filter(
-                Q(title__icontains=search) |
-                Q(authors__icontains=search) |
-                Q(genre__icontains=search)
-            )
-
-        # 📚 Filtro por Género
-        genres = request.GET.getlist('genre')
-        if genres:
-            qs = qs.filter(genre__in=genres)
-
-        # 👤 Filtro por Autor
-        authors = request.GET.getlist('author')
-        if authors:
-            qs = qs.filter(authors__in=authors)
-
-        # 💰 Filtro por Rango de Precio
-        price_range = request.GET.get('price_range', '').strip()
-        if price_range:
-            try:
-                min_price, max_price = map(int, price_range.split('-'))
-                qs = qs.filter(precio__gte=min_price, precio__lte=max_price)
-            except ValueError:
-                pass
-
-        # ⭐ Filtro por Rating
-        rating = request.GET.get('rating', '').strip()
-        if rating:
-            try:
-                rating_value = float(rating)
-                qs = qs.filter(average_rating__gte=rating_value)
-            except ValueError:
-                pass
-
-        # 📅 Filtro por Año
-        year_range = request.GET.get('year', '').strip()
-        if year_range:
-            try:
-                start_year, end_year = map(int, year_range.split('-'))
-                qs = qs.filter(publication_date__gte=start_year, publication_date__lte=end_year)
-            except ValueError:
-                pass
+        self.filters = parse_filters(request.GET)
+        qs = apply_filters(qs, self.filters)
+
+        # 📊 Ordenamiento (con desempate por id, ver pagination.sort_ordering)
+        self.sort_by = request.GET.get('sort_by', '').strip()
+        if self.sort_by not in SORT_FIELDS:
+            self.sort_by = DEFAULT_SORT
+        return qs.order_by(*sort_ordering(self.sort_by))
+
+    def paginate_queryset(self, queryset, page_size):
+        # ➡️ Con ?cursor= se pagina por keyset: sin OFFSET ni COUNT
+        cursor = self.request.GET.get('cursor')
+        if cursor is None:
+            # 🗃️ Ids ordenados cacheados por filtros + orden: cada página es un in_bulk
+            # Filtrar u ordenar por calificación depende también de la versión 'ratings'
+            by_rating = self.filters.get('rating') or SORT_FIELDS[self.sort_by][0] == 'average_rating'
+            namespaces = ('catalog', 'ratings') if by_rating else 'catalog'
+            books = cached_results(queryset, signature(self.filters), self.sort_by, namespaces=namespaces)
+            return super().paginate_queryset(books, page_size)
+        page = keyset_page(queryset, self.sort_by, cursor, page_size)
+        return None, page, page.object_list, page.has_next or page.has_previous
 
-        # 📊 Ordenamiento
-        sort_by = request.GET.get('sort_by', '').strip()
-        
-        if sort_by == 'price_low':
-            qs = qs.order_by('precio')
-        elif sort_by == 'price_high':
-            qs = qs.order_by('-precio')
-        elif sort_by == 'rating_high':
-            qs = qs.order_by('-average_rating')
-        elif sort_by == 'rating_low':
-            qs = qs.order_by('average_rating')
-        elif sort_by == 'year_new':
-            qs = qs.order_by('-publication_date')
-        elif sort_by == 'year_old':
-            qs = qs.order_by('publication_date')
-        elif sort_by == 'title_az':
-            qs = qs.order_by('title')
-        elif sort_by == 'title_za':
-            qs = qs.order_by('-title')
-        else:
-            # Orden por defecto
-            qs = qs.order_by('title')
-
-        return qs
-    
 class Top100BooksView(ListView):
     model = Book
     template_name = "books/top_100.html"
@@ -316,9 +254,8 @@ class Top100BooksView(ListView):
     paginate_by = 20
 
     def get_queryset(self):
-        return Book.objects.filter(
-            average_rating__isnull=False
-        ).order_by('-average_rating')[:100]
+        # Ranking materializado por calificación ponderada
+        return top_books(100)
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -330,35 +267,82 @@ class Top100BooksView(ListView):
 
 class BookSearchView(ListView):
     model = Book
-    template_name = "book_search_results.html"
+    template_name = "books/book_search_results.html"
     context_object_name = "books"
     paginate_by = 6
 
     def get_queryset(self):
         query = self.request.GET.get('q')
-        if query:
-            return Book.objects.filter(
-                Q(title__icontains=query) |
-                Q(authors__icontains=query) |
-                Q(genre__icontains=query)
-            ).distinct()
-        return Book.objects.none()
+        self.search_mode = self.request.GET.get('mode', 'lexical')
+        self.vector_used = False
+        self.corrected_query = None
+        self.suggested_query = None
+        if not query:
+            return Book.objects.none()
+
+        # 🔀 Modo híbrido: léxico + semántico fusionados con RRF
+        if self.search_mode == 'hybrid':
+            ids, self.vector_used = hybrid_search(query)
+            return BooksById(ids)
+
+        results = self.lexical_results(query)
+
+        # ✏️ Pocos resultados: ¿quisiste decir...? (``exact=1`` lo desactiva)
+        if self.request.GET.get('exact') or self.count(results) >= getattr(settings, 'SPELLING_MIN_RESULTS', 3):
+            return results
+        correction = suggest_correction(query)
+        if not correction:
+            return results
+        corrected = self.lexical_results(correction)
+        if self.count(corrected) <= self.count(results):
+            return results
+        if self.count(results):
+            self.suggested_query = correction
+            return results
+        # Sin ningún resultado se aplica la corrección directamente
+        self.corrected_query = correction
+        return corrected
+
+    def lexical_results(self, query):
+        # Índice de texto completo, ordenado por relevancia (BM25). Se traen
+        # los primeros ids; si hay más, el total es un COUNT y las páginas
+        # siguientes se piden al índice
+        limit = getattr(settings, 'SEARCH_MAX_IDS', 1000)
+        ids = search_index.search_ids(query, limit)
+        if ids is not None:
+            if len(ids) < limit:
+                return BooksById(ids)
+            return BooksById(ids, total=search_index.count_matches(query),
+                              overflow=search_index.Matches(query, Book.objects.all()))
+        return search_index.filter_queryset(Book.objects.all(), query).order_by('id')
+
+    @staticmethod
+    def count(results):
+        return len(results) if isinstance(results, BooksById) else results.count()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['search_mode'] = self.search_mode
+        context['vector_used'] = self.vector_used
+        context['corrected_query'] = self.corrected_query
+        context['suggested_query'] = self.suggested_query
+        return context
 
 
 def statistics_view(request):
-    all_books = Book.objects.all()
-    book_counts_by_year = {}
-    for book in all_books:
-        year = str(book.publication_date) if book.publication_date else "Sin año"
-        book_counts_by_year[year] = book_counts_by_year.get(year, 0) + 1
+    # Conteos agregados en la base de datos, guardados en CatalogStats; los
+    # gráficos se dibujan una vez por cada foto
+    snapshot = get_stats_snapshot()
+    charts = cache.get_or_set(
+        f'statistics:{snapshot.computed_at.isoformat()}',
+        lambda: render_statistics_charts(dict(snapshot.by_year), dict(snapshot.by_genre)),
+    )
+    return render(request, 'books/statistics.html', charts)
 
-    book_counts_by_genre = {}
-    for book in all_books:
-        genre = book.genre if book.genre else "Sin género"
-        book_counts_by_genre[genre] = book_counts_by_genre.get(genre, 0) + 1
 
+def render_statistics_charts(book_counts_by_year, book_counts_by_genre):
     plt.figure(figsize=(8, 4))
-    years = sorted(book_counts_by_year.keys())
+    years = list(book_counts_by_year.keys())
     values = [book_counts_by_year[y] for y in years]
     plt.bar(years, values, color="#20bfa9")
     plt.title('Libros por año')
@@ -371,7 +355,7 @@ def statistics_view(request):
     plt.close()
 
     plt.figure(figsize=(8, 4))
-    genres = sorted(book_counts_by_genre.keys())
+    genres = list(book_counts_by_genre.keys())
     values = [book_counts_by_genre[g] for g in genres]
     plt.bar(genres, values, color="#178f7a")
     plt.title('Libros por género')
@@ -383,10 +367,10 @@ def statistics_view(request):
     buffer2.close()
     plt.close()
 
-    return render(request, 'statistics.html', {
+    return {
         'graphic_year': graphic_year,
         'graphic_genre': graphic_genre
-    })
+    }
 
 
 def promociones_view(request):
@@ -407,26 +391,22 @@ def book_detail(request, book_id):
         except Review.DoesNotExist:
             pass
     
-    # 🆕 LIBROS SIMILARES (usando embeddings)
-    similar_books = []
-    if book.embeddings:
-        try:
-            book_emb = np.array(book.embeddings, dtype=np.float32)
-            books_with_similarity = []
-            
-            for other_book in Book.objects.exclude(id=book.id).exclude(embeddings__isnull=True)[:100]:
-                try:
-                    other_emb = np.array(other_book.embeddings, dtype=np.float32)
-                    similarity = cosine_similarity(book_emb, other_emb)
-                    books_with_similarity.append((other_book, similarity))
-                except Exception:
-                    continue
-            
-            books_with_similarity.sort(key=lambda x: x[1], reverse=True)
-            similar_books = [b[0] for b in books_with_similarity[:6]]
-        except Exception:
-            pass
-    
+    # 🆕 LIBROS SIMILARES (precalculados con compute_similar_books)
+    similar_books = [
+        entry.similar for entry in
+        SimilarBook.objects.filter(book=book).select_related('similar')[:6]
+    ]
+
+    # Libros aún sin vecinos precalculados: búsqueda directa en el almacén
+    if not similar_books:
+        store = get_embedding_store()
+        book_emb = store.vector(book.id)
+        if book_emb is not None:
+            top = search_store(store, book_emb, 6, exclude_ids=[book.id])
+            top_ids = [book_id for book_id, _ in top]
+            books_by_id = Book.objects.in_bulk(top_ids)
+            similar_books = [books_by_id[i] for i in top_ids if i in books_by_id]
+
     # Si no hay similares por embeddings, usar mismo género
     if not similar_books and book.genre:
         similar_books = Book.objects.filter(
@@ -458,27 +438,13 @@ def recommend_book(request):
             })
 
         try:
-            client = get_openai_client()  # ✅ Se inicializa aquí
+            # Solo se llama al proveedor si el prompt no está en la caché
+            model = get_embedding_provider().model
+            prompt_emb = prompt_embedding_cache.get(prompt, model, embed_prompt)
 
-            response = client.embeddings.create(
-                model="text-embedding-3-small",
-                input=[prompt]
-            )
-            prompt_emb = np.array(response.data[0].embedding, dtype=np.float32)
-
-            books_with_similarity = []
-            for book in Book.objects.exclude(embeddings__isnull=True):
-                try:
-                    if not book.embeddings:
-                        continue
-                    book_emb = np.array(book.embeddings, dtype=np.float32)
-                    similarity = cosine_similarity(prompt_emb, book_emb)
-                    books_with_similarity.append((book, similarity))
-                except Exception:
-                    continue
-
-            books_with_similarity.sort(key=lambda x: x[1], reverse=True)
-            top_books = books_with_similarity[:5]
+            top = ann_search(get_embedding_store(), prompt_emb, 5)
+            books_by_id = Book.objects.in_bulk([book_id for book_id, _ in top])
+            top_books = [(books_by_id[i], s) for i, s in top if i in books_by_id]
 
             if not top_books:
                 return render(request, "books/recommend.html", {
@@ -982,50 +948,21 @@ def personalized_recommendations_view(request):
     """
     user = request.user
     
-    # Obtener libros favoritos
-    favorite_books = Book.objects.filter(
-        id__in=Favorite.objects.filter(user=user).values_list('book_id', flat=True)
-    )
-    
-    # Obtener historial de compras
-    purchased_books = Book.objects.filter(
-        id__in=OrderItem.objects.filter(
-            order__user=user
-        ).values_list('book_id', flat=True)
-    ).distinct()
-    
     # Generar recomendaciones
     recommended_books = []
-    
+    base_ids = history_book_ids(user.id)
+
     try:
-        base_books = list(favorite_books) + list(purchased_books)
-        
-        if base_books:
-            embeddings_list = []
-            for book in base_books:
-                if book.embeddings:
-                    embeddings_list.append(np.array(book.embeddings, dtype=np.float32))
-            
-            if embeddings_list:
-                avg_embedding = np.mean(embeddings_list, axis=0)
-                books_with_similarity = []
-                
-                exclude_ids = [b.id for b in base_books]
-                
-                for candidate in Book.objects.exclude(id__in=exclude_ids).exclude(embeddings__isnull=True)[:300]:
-                    try:
-                        candidate_emb = np.array(candidate.embeddings, dtype=np.float32)
-                        similarity = cosine_similarity(avg_embedding, candidate_emb)
-                        books_with_similarity.append((candidate, similarity))
-                    except Exception:
-                        continue
-                
-                books_with_similarity.sort(key=lambda x: x[1], reverse=True)
-                recommended_books = [b[0] for b in books_with_similarity[:20]]
-    
+        taste = get_taste_vector(user)
+        if taste is not None:
+            top = search_store(get_embedding_store(), taste, 20, exclude_ids=base_ids)
+            top_ids = [book_id for book_id, _ in top]
+            books_by_id = Book.objects.in_bulk(top_ids)
+            recommended_books = [books_by_id[i] for i in top_ids if i in books_by_id]
+
     except Exception as e:
         print(f"Error: {e}")
-    
+
     # Completar con mejor valorados si faltan
     if len(recommended_books) < 20:
         additional = Book.objects.filter(
@@ -1038,7 +975,7 @@ def personalized_recommendations_view(request):
     
     context = {
         'recommended_books': recommended_books,
-        'base_books_count': len(base_books) if 'base_books' in locals() else 0,
+        'base_books_count': len(set(base_ids)),
     }
     
     return render(request, 'books/personalized_recommendations.html', context)